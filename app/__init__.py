@@ -1,20 +1,64 @@
+import time
+_import_started = time.perf_counter()
+
+import os
 from flask import Flask, redirect, url_for, render_template
+from jinja2 import FileSystemBytecodeCache
 from flask_login import current_user, login_required
 from datetime import timedelta
-from sqlalchemy import func
 from .config import Config
 from .extensions import db, login_manager
-from .blueprints.projects import projects_bp
+from .startup import init_startup_report, record_factory_time
 
 
 def create_app():
+    factory_started = time.perf_counter()
+
     app = Flask(__name__)
 
     app.config.from_object(Config)
 
+    init_startup_report(app, _import_seconds)
+    # after_request は登録の逆順に動くので、最後に本文を圧縮するよう先に登録する
+    # （任意の機能は有効なときだけ import し、無効なワーカーの起動を重くしない）
+    if app.config["COMPRESSION_ENABLED"]:
+        from .compression import init_compression
+        init_compression(app)
+
+    # テンプレートのコンパイル結果をファイルに残し、新しいワーカーでも再コンパイルしない
+    bytecode_cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        app.jinja_options = {
+            **app.jinja_options,
+            "bytecode_cache": FileSystemBytecodeCache(bytecode_cache_dir),
+        }
+
+    from .assets import init_assets
+    from .fragment_cache import init_fragment_cache
+    init_assets(app)
+    init_fragment_cache(app)
+
+    from .blueprints.projects import projects_bp
     app.register_blueprint(projects_bp, url_prefix="/projects")
     
     db.init_app(app)
+    if app.config["TASK_SHARDING"]:
+        from .sharding import init_sharding
+        init_sharding(app)
+
+    if app.config["SQL_PROFILER_ENABLED"]:
+        from .profiler import init_sql_profiler
+        init_sql_profiler(app)
+    if app.config["METRICS_ENABLED"]:
+        from .metrics import init_metrics
+        init_metrics(app)
+    if app.config["JOBS_WORKERS"] > 0:
+        from .jobs import init_jobs
+        init_jobs(app)
+
+    from .user_search import init_user_search
+    init_user_search(app)
 
     login_manager.init_app(app)
 
@@ -28,9 +72,8 @@ def create_app():
             pending_count = 0
         return dict(pending_count=pending_count)
 
-    @login_manager.user_loader
-    def load_user(user_id: str):
-        return db.session.get(User, int(user_id))
+    from .identity import load_user
+    login_manager.user_loader(load_user)
 
     login_manager.login_view = "auth.login"
 
@@ -40,40 +83,17 @@ def create_app():
     from .blueprints.admin import admin_bp
     app.register_blueprint(admin_bp, url_prefix="/admin")
 
+    from .blueprints.jobs import jobs_bp
+    app.register_blueprint(jobs_bp, url_prefix="/jobs")
+
+    from .dashboard import load_summary
+
     @app.get("/dashboard")
     @login_required
     def dashboard():
-        from .models.project import Project
-        from .models.task import Task
-        from .models.user import User
-        from .models.project_member import ProjectMember
-  
-        # プロジェクト数（自分が所属している数）
-        my_project_ids = (
-            db.session.query(ProjectMember.project_id)
-            .filter(ProjectMember.user_id == current_user.id)
-            .subquery()
-        )
-        project_count = db.session.query(func.count()).select_from(my_project_ids).scalar() or 0
-
-        done_values = {"done"}
-
-        all_tasks_in_my_projects = Task.query.filter(Task.project_id.in_(my_project_ids))
-        total_task_count = all_tasks_in_my_projects.count()
-        open_task_count = all_tasks_in_my_projects.filter(~Task.status.in_(done_values)).count()
-
-        # 承認待ちユーザー数（adminのみ表示）
-        pending_user_count = 0
-        if current_user.role == "admin" and hasattr(User, "is_approved"):
-            pending_user_count = User.query.filter_by(is_approved=False).count()
-
-        return render_template(
-            "dashboard.html",
-            project_count=project_count,
-            total_task_count=total_task_count,
-            open_task_count=open_task_count,
-            pending_user_count=pending_user_count,
-        )
+        # 自分の担当・期限切れ・今週の完了とステータス別件数を1回の集計で出す（ユーザーごとに短時間キャッシュ）
+        # 承認待ちユーザー数は inject_pending_count の pending_count を使う
+        return render_template("dashboard.html", summary=load_summary(current_user.id))
 
     @app.get("/")
     def home():
@@ -87,4 +107,13 @@ def create_app():
             return ""
         return (dt + timedelta(hours=9)).strftime("%Y-%m-%d %H:%M")
 
-    return app
\ No newline at end of file
+    from .cli import register_cli
+    register_cli(app)
+
+    record_factory_time(app, factory_started)
+
+    return app
+
+
+# パッケージ import にかかった時間（起動レポート用）
+_import_seconds = time.perf_counter() - _import_started
@@ -0,0 +1,226 @@
+import math
+import threading
+from time import monotonic
+from datetime import datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .models.project_daily_stat import ProjectDailyStat
+from .models.task import Task
+from .models.task_status_event import TaskStatusEvent
+from .jobs import enqueue_once, has_workers
+from .transactions import run_in_transaction
+
+# 日付の区切りは日本時間（画面表示の jst フィルタと揃える）
+JST_OFFSET = timedelta(hours=9)
+
+STATUSES = (Task.STATUS_TODO, Task.STATUS_DOING, Task.STATUS_DONE)
+
+# project_id → 最後に作り足した（ジョブを登録した）時刻（monotonic）
+_last_refresh = {}
+_refresh_lock = threading.Lock()
+
+
+def jst_date(dt):
+    return (dt + JST_OFFSET).date()
+
+
+def jst_today():
+    return jst_date(datetime.utcnow())
+
+
+def _day_start_utc(day):
+    return datetime.combine(day, time.min) - JST_OFFSET
+
+
+def percentile(sorted_values, q: float):
+    """最近接順位法でのパーセンタイル（sorted_values は昇順）。"""
+    if not sorted_values:
+        return None
+    idx = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[idx]
+
+
+def _cycle_starts(project_id: int, since):
+    """
+    since 以降に done になったタスクについて、サイクルタイムの開始時刻 {task_id: 時刻} を返す。
+    開始は最初に doing になった時刻。doing を経ずに完了したものは作成時刻（todo になった時刻）。
+    日ごとに引かず、期間全体を1回の GROUP BY で読む。
+    """
+    done_since = (
+        select(TaskStatusEvent.task_id)
+        .where(
+            TaskStatusEvent.project_id == project_id,
+            TaskStatusEvent.to_status == Task.STATUS_DONE,
+            TaskStatusEvent.created_at >= since,
+        )
+    )
+    rows = db.session.execute(
+        select(TaskStatusEvent.task_id, TaskStatusEvent.to_status, func.min(TaskStatusEvent.created_at))
+        .where(
+            TaskStatusEvent.project_id == project_id,
+            TaskStatusEvent.task_id.in_(done_since),
+            TaskStatusEvent.to_status.in_([Task.STATUS_DOING, Task.STATUS_TODO]),
+        )
+        .group_by(TaskStatusEvent.task_id, TaskStatusEvent.to_status)
+    ).all()
+
+    started, created = {}, {}
+    for task_id, status, at in rows:
+        (started if status == Task.STATUS_DOING else created)[task_id] = at
+    return {**created, **started}
+
+
+def _cycle_hours(done_events, starts):
+    """その日に done になった (task_id, 完了時刻) から、サイクルタイム（時間）の昇順リストを返す。"""
+    hours = []
+    for task_id, done_at in done_events:
+        start = starts.get(task_id)
+        if start is not None and start <= done_at:
+            hours.append((done_at - start).total_seconds() / 3600)
+    return sorted(hours)
+
+
+def build_snapshots(project_id: int, today=None) -> int:
+    """
+    project_daily_stats を最後に保存した日から今日まで作り直す。作った行数を返す。
+
+    前日の件数に、その日の履歴（from_status -1 / to_status +1）を足していくので、
+    読むのは前回以降の task_status_events だけで済む。
+    最後に保存した行は日中に作った途中経過かもしれないので、その前の行を起点にして作り直す
+    （途中経過の行を翌日以降の起点にすると、その後の履歴が数えられないままになる）。
+    """
+    today = today or jst_today()
+
+    latest = (
+        ProjectDailyStat.query
+        .filter(ProjectDailyStat.project_id == project_id, ProjectDailyStat.day <= today)
+        .order_by(ProjectDailyStat.day.desc())
+        .first()
+    )
+    base = None
+    if latest is not None:
+        base = (
+            ProjectDailyStat.query
+            .filter(ProjectDailyStat.project_id == project_id, ProjectDailyStat.day < latest.day)
+            .order_by(ProjectDailyStat.day.desc())
+            .first()
+        )
+    if base is not None:
+        start_day = base.day + timedelta(days=1)
+        counts = {
+            Task.STATUS_TODO: base.todo_count,
+            Task.STATUS_DOING: base.doing_count,
+            Task.STATUS_DONE: base.done_count,
+        }
+    else:
+        first_at = db.session.execute(
+            select(func.min(TaskStatusEvent.created_at)).where(TaskStatusEvent.project_id == project_id)
+        ).scalar()
+        if first_at is None:
+            return 0
+        start_day = jst_date(first_at)
+        counts = {s: 0 for s in STATUSES}
+
+    since = _day_start_utc(start_day)
+    events = iter(db.session.execute(
+        select(
+            TaskStatusEvent.task_id,
+            TaskStatusEvent.from_status,
+            TaskStatusEvent.to_status,
+            TaskStatusEvent.created_at,
+        )
+        .where(
+            TaskStatusEvent.project_id == project_id,
+            TaskStatusEvent.created_at >= since,
+        )
+        .order_by(TaskStatusEvent.created_at.asc(), TaskStatusEvent.id.asc())
+        .execution_options(yield_per=1000)
+    ))
+
+    days = []
+    day = start_day
+    pending = next(events, None)
+
+    while day <= today:
+        day_end = _day_start_utc(day + timedelta(days=1))
+        done_events = []
+        while pending is not None and pending.created_at < day_end:
+            task_id, from_status, to_status, at = pending
+            if from_status in counts:
+                counts[from_status] -= 1
+            if to_status in counts:
+                counts[to_status] += 1
+            if to_status == Task.STATUS_DONE:
+                done_events.append((task_id, at))
+            pending = next(events, None)
+        days.append((day, dict(counts), done_events))
+        day += timedelta(days=1)
+
+    starts = _cycle_starts(project_id, since) if any(done for _, _, done in days) else {}
+    rows = []
+    for day, day_counts, done_events in days:
+        hours = _cycle_hours(done_events, starts)
+        p50, p90 = percentile(hours, 0.5), percentile(hours, 0.9)
+        rows.append({
+            "project_id": project_id,
+            "day": day,
+            "todo_count": day_counts[Task.STATUS_TODO],
+            "doing_count": day_counts[Task.STATUS_DOING],
+            "done_count": day_counts[Task.STATUS_DONE],
+            "completed_count": len(done_events),
+            "cycle_time_p50_hours": round(p50, 2) if p50 is not None else None,
+            "cycle_time_p90_hours": round(p90, 2) if p90 is not None else None,
+        })
+
+    try:
+        # 作り直す範囲（最後に保存した途中経過の行以降）を消してから入れ直す
+        db.session.execute(
+            db.delete(ProjectDailyStat).where(
+                ProjectDailyStat.project_id == project_id,
+                ProjectDailyStat.day >= start_day,
+            )
+        )
+        if rows:
+            db.session.execute(ProjectDailyStat.__table__.insert(), rows)
+        db.session.commit()
+    except IntegrityError:
+        # 同時に別のリクエストが作り終えていた
+        db.session.rollback()
+        return 0
+    return len(rows)
+
+
+def refresh_snapshots(project_id: int):
+    """
+    分析画面から呼ぶ。ANALYTICS_REFRESH_INTERVAL 秒に1回まで（プロジェクトごと）スナップショットを作り足す。
+    ワーカーがいれば build_snapshots ジョブに回し、いなければその場で作る（ロック待ちはやり直す）。
+    画面を開くたびに書き込みロックを取らないよう、間隔内は何もしない。
+    """
+    now = monotonic()
+    with _refresh_lock:
+        last = _last_refresh.get(project_id)
+        if last is not None and now - last < current_app.config["ANALYTICS_REFRESH_INTERVAL"]:
+            return
+        _last_refresh[project_id] = now
+
+    if has_workers():
+        run_in_transaction(
+            lambda: enqueue_once("build_snapshots", {"project_id": project_id}, commit=False),
+            label="analytics",
+        )
+    else:
+        run_in_transaction(lambda: build_snapshots(project_id), label="analytics")
+
+
+def load_snapshots(project_id: int, days: int, today=None):
+    """直近 days 日分のスナップショットを日付順に返す（読むのは最大 days 行）。"""
+    today = today or jst_today()
+    since = today - timedelta(days=days - 1)
+    return (
+        ProjectDailyStat.query
+        .filter(ProjectDailyStat.project_id == project_id, ProjectDailyStat.day >= since)
+        .order_by(ProjectDailyStat.day.asc())
+        .all()
+    )
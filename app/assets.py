@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from flask import abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli は任意。無ければ .gz だけ作る
+    brotli = None
+
+# static/ 以下でビルド対象にする拡張子
+ASSET_EXTENSIONS = (".css", ".js", ".svg")
+
+DIST_DIR_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+# ファイル名にハッシュが入っているので中身が変わればURLも変わる → 1年キャッシュしてよい
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _dist_dir(app) -> str:
+    return os.path.join(app.static_folder, DIST_DIR_NAME)
+
+
+def build_assets(app):
+    """
+    static/ 以下の CSS/JS に内容ハッシュ付きのファイル名を付けて static/dist/ に書き出し、
+    .gz（と brotli があれば .br）も作る。元のパス → ハッシュ付きパスの対応表を返す。
+    """
+    static_dir = app.static_folder
+    dist_dir = _dist_dir(app)
+    manifest = {}
+
+    for root, dirs, files in os.walk(static_dir):
+        # 出力先は対象にしない
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for name in files:
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_dir).replace(os.sep, "/")
+
+            with open(src, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{digest}{ext}"
+
+            out = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            with open(out, "wb") as f:
+                f.write(data)
+            # mtime=0 にして、同じ内容なら同じ .gz になるようにする
+            with open(out + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(out + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+
+            manifest[rel] = hashed
+
+    os.makedirs(dist_dir, exist_ok=True)
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    app.extensions["asset_manifest"] = manifest
+    return manifest
+
+
+def load_manifest(app) -> dict:
+    path = os.path.join(_dist_dir(app), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def asset_url(filename: str) -> str:
+    """
+    url_for("static", filename=...) の代わりにテンプレートで使う。
+    ビルド済みならハッシュ付きURL、未ビルド（開発中）なら通常の static URL を返す。
+    """
+    app = current_app
+    hashed = None if app.debug else app.extensions.get("asset_manifest", {}).get(filename)
+    if hashed is None:
+        return url_for("static", filename=filename)
+    return url_for("assets", filename=hashed)
+
+
+def init_assets(app):
+    app.extensions["asset_manifest"] = load_manifest(app)
+    app.add_template_global(asset_url)
+
+    @app.get("/assets/<path:filename>")
+    def assets(filename):
+        dist_dir = _dist_dir(app)
+        # 対応表に載っているハッシュ付きファイルだけを配信する
+        if filename not in app.extensions["asset_manifest"].values():
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        accept = request.accept_encodings
+
+        encoding = None
+        if "br" in accept and os.path.exists(os.path.join(dist_dir, filename + ".br")):
+            encoding = "br"
+        elif "gzip" in accept and os.path.exists(os.path.join(dist_dir, filename + ".gz")):
+            encoding = "gzip"
+
+        if encoding is None:
+            response = send_from_directory(dist_dir, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+        else:
+            suffix = ".br" if encoding == "br" else ".gz"
+            response = send_from_directory(dist_dir, filename + suffix, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+            response.headers["Content-Encoding"] = encoding
+
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add("Accept-Encoding")
+        return response
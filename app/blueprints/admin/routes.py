@@ -3,24 +3,30 @@ from flask_login import login_required, current_user
 
 from . import admin_bp
 from ...models.user import User
+from ...read_models import user_rows
+from ...identity import require_fresh_user
 
 def admin_required():
-    if not current_user.is_authenticated or current_user.role != "admin":
+    # 権限は（セッションのスナップショットではなく）DB の値で確認する
+    if require_fresh_user().role != "admin":
         abort(403)
 
 @admin_bp.get("/users")
 @login_required
 def list_users():
     admin_required()
-    users = User.query.order_by(User.id.asc()).all()
-    return render_template("admin/users.html", users=users)
+    return render_template("admin/users.html", users=user_rows())
 
 from flask import request, redirect, url_for, flash
 from ...extensions import db
+from ...transactions import transactional
+from ...user_search import user_changed
+from ...identity import invalidate_user
 
 
 @admin_bp.post("/users/<int:user_id>/role")
 @login_required
+@transactional
 def change_role(user_id):
     admin_required()
 
@@ -37,12 +43,13 @@ def change_role(user_id):
             return redirect(url_for("admin.list_users"))
 
     target.role = new_role
-    db.session.commit()
+    invalidate_user(target)
     return redirect(url_for("admin.list_users"))
 
 
 @admin_bp.post("/users/<int:user_id>/toggle-active")
 @login_required
+@transactional
 def toggle_active(user_id):
     admin_required()
 
@@ -55,11 +62,13 @@ def toggle_active(user_id):
         return redirect(url_for("admin.list_users"))
 
     target.is_active = not target.is_active
-    db.session.commit()
+    invalidate_user(target)
+    user_changed(target)
     return redirect(url_for("admin.list_users"))
 
 @admin_bp.post("/users/<int:user_id>/approve")
 @login_required
+@transactional
 def approve_user(user_id):
     admin_required()
 
@@ -72,7 +81,8 @@ def approve_user(user_id):
     target.is_active = True
     target.is_locked = False
     target.failed_login_attempts = 0
+    invalidate_user(target)
+    user_changed(target)
 
-    db.session.commit()
     flash("承認しました", "success")
     return redirect(url_for("admin.list_users"))
\ No newline at end of file
@@ -5,6 +5,10 @@ from werkzeug.security import check_password_hash,generate_password_hash
 from . import auth_bp
 from ...models.user import User
 from ...extensions import db
+from ...transactions import transactional
+from ...user_search import user_changed
+from ...identity import remember_user, forget_user
+from sqlalchemy.exc import IntegrityError
 import re
 
 def is_valid_password(password: str) -> bool:
@@ -14,6 +18,7 @@ def is_valid_password(password: str) -> bool:
     return bool(has_letter and has_digit and long_enough)
 
 @auth_bp.route("/signup", methods=["GET", "POST"])
+@transactional
 def signup():
     if request.method == "GET":
         return render_template("auth/signup.html")
@@ -50,7 +55,13 @@ def signup():
         is_approved=False,
     )
     db.session.add(user)
-    db.session.commit()
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # 重複チェックの後、同じ社員番号が先に登録された
+        db.session.rollback()
+        return render_template("auth/signup.html", error="その社員番号はすでに登録されています")
+    user_changed(user)
 
     # 申請完了メッセージ
     flash("申請を受け付けました。管理者の承認後にログインできます。", "info")
@@ -91,10 +102,12 @@ def login():
         return render_template("auth/login.html", error="パスワードが違います")
 
     login_user(user)
+    remember_user(user)
     return redirect(url_for("home"))
 
 @auth_bp.get("/logout")
 @login_required
 def logout():
     logout_user()
+    forget_user()
     return redirect(url_for("auth.login"))
\ No newline at end of file
@@ -0,0 +1,50 @@
+import os
+from flask import jsonify, url_for, send_file, abort, current_app
+from flask_login import login_required, current_user
+
+from . import jobs_bp
+from ...extensions import db
+from ...exporters import EXPORT_FORMATS
+from ...jobs import export_path
+from ...models.job import Job
+
+
+def _get_own_job(job_id):
+    """自分が登録したジョブ（admin は全件）だけを返す。"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        abort(404)
+    if current_user.role != "admin" and job.created_by != current_user.id:
+        abort(403)
+    return job
+
+
+# ジョブの状態（クライアントはこれをポーリングする）
+@jobs_bp.get("/<int:job_id>")
+@login_required
+def job_status(job_id):
+    job = _get_own_job(job_id)
+
+    data = job.to_dict()
+    if job.kind == "export" and job.status == Job.STATUS_SUCCEEDED:
+        data["download_url"] = url_for("jobs.download", job_id=job.id)
+    return jsonify(data)
+
+
+# エクスポートジョブの結果ファイル
+@jobs_bp.get("/<int:job_id>/download")
+@login_required
+def download(job_id):
+    job = _get_own_job(job_id)
+
+    if job.kind != "export" or job.status != Job.STATUS_SUCCEEDED:
+        abort(404)
+
+    fmt = job.payload_data["format"]
+    path = export_path(current_app, job.id, fmt)
+    if not os.path.exists(path):
+        abort(404)
+
+    response = send_file(path, as_attachment=True, download_name=job.result_data["filename"])
+    response.headers["Content-Type"] = EXPORT_FORMATS[fmt]
+    return response
@@ -1,123 +1,104 @@
 from datetime import datetime, date
-from flask import render_template, request, redirect, url_for, current_app, flash, abort
+from flask import render_template, request, redirect, url_for, current_app, flash, abort, Response, stream_with_context, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import case, func
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from ...extensions import db
 from ...models.project import Project
 from ...models.project_member import ProjectMember
 from ...models.user import User
 from ...models.task import Task
+from ...models.task_status_event import TaskStatusEvent
+from ...journal import journal_path, parse_journal_entries
+from ...exporters import EXPORT_FORMATS, stream_export
+from ...importers import IMPORT_COLUMNS, ImportAborted, import_tasks_csv
+from ...analytics import load_snapshots, refresh_snapshots
+from ...jobs import enqueue, enqueue_once, has_workers, rebalance_ranks
+from ...ranking import rank_between
+from ...fragment_cache import cached_fragment, get_fragment, render_fragment, set_fragment
+from ...transactions import is_busy_error, run_in_transaction, transactional
+from ...identity import get_project_or_404, my_membership
+from ...sharding import cache_versions, fan_out, select_shard
+from ...dashboard import forget_summary
+from ...read_models import project_rows, task_cards, task_options
+from ...user_search import USER_SEARCH_LIMIT, search_users
 
 from . import projects_bp
-import os, re
+import io, os
 
-def parse_journal_entries(text: str):
-    """
-    フォーマット例:
-    [2026-02-16 14:57] 山田太郎（ID:1001）
-    本文...
-    """
-    entries = []
-    if not text:
-        return entries
-
-    lines = text.splitlines()
-    current = None
-    
-    header_re = re.compile(
-        r'^\[(?P<ts>[\d\-:\s]+)\]\s*(?P<who>.+?)(?:\s*\|\s*task:(?P<task_id>\d+):(?P<task_title>.*))?$'
-    )
-
-    for line in lines:
-        m = header_re.match(line.strip())
-        if m:
-            if current:
-                current["body"] = "\n".join(current["body"]).strip()
-                entries.append(current)
-            current = {
-                "ts": m.group("ts").strip(),
-                "who": (m.group("who") or "").strip(),
-                "task_id": int(m.group("task_id")) if m.group("task_id") else None,
-                "task_title": (m.group("task_title") or "").strip() if m.group("task_title") else "",
-                "body": []
-            }
-        else:
-            if current is not None:
-                current["body"].append(line)
+@projects_bp.url_value_preprocessor
+def _select_shard(endpoint, values):
+    # TASK_SHARDING のときは URL の project_id でタスク側の DB（シャード）を選ぶ
+    if values and "project_id" in values:
+        select_shard(values["project_id"])
 
-    if current:
-        current["body"] = "\n".join(current["body"]).strip()
-        entries.append(current)
-
-    entries.reverse()
-    return entries
 
 def can_access_project(project_id: int) -> bool:
     if current_user.role == "admin":
         return True
-    m = ProjectMember.query.filter_by(project_id=project_id, user_id=current_user.id).first()
-    return m is not None
+    return my_membership(project_id) is not None
 
 
 def is_project_owner(project_id: int) -> bool:
     if current_user.role == "admin":
         return True
-    owner = ProjectMember.query.filter_by(
-        project_id=project_id,
-        user_id=current_user.id,
-        role_in_project="owner"
-    ).first()
-    return owner is not None
+    m = my_membership(project_id)
+    return m is not None and m.role_in_project == "owner"
 
 
 def can_manage_members(project_id: int) -> bool:
     if current_user.role == "admin":
         return True
-    if is_project_owner(project_id):
-        return True
-
-    pm = ProjectMember.query.filter_by(project_id=project_id, user_id=current_user.id).first()
-    return pm is not None and pm.role_in_project == "leader"
+    m = my_membership(project_id)
+    return m is not None and m.role_in_project in ("owner", "leader")
 
 
 @projects_bp.get("/")
 @login_required
 def list_projects():
-    if current_user.role == "admin":
-        projects = Project.query.all()
-    else:
-        projects = (
-            db.session.query(Project)
-            .join(ProjectMember, Project.id == ProjectMember.project_id)
-            .filter(ProjectMember.user_id == current_user.id)
-            .all()
+    # 一覧は読むだけなので、ORM のエンティティではなく必要な列だけの行を使う
+    projects = project_rows(None if current_user.role == "admin" else current_user.id)
+
+    # カードはプロジェクトの版番号ごとにキャッシュし、外れたものだけ集計・描画する
+    versions = cache_versions(projects)
+    cards = {}
+    missing = []
+    for p in projects:
+        cards[p.id] = get_fragment(f"project_card:{p.id}:{versions[p.id]}")
+        if cards[p.id] is None:
+            missing.append(p)
+
+    if missing:
+        project_ids = [p.id for p in missing]
+
+        # projectごとの status 件数をまとめて取得（N+1回防止）
+        stats_rows = fan_out(
+            project_ids,
+            lambda ids: db.select(Task.project_id, Task.status, func.count(Task.id))
+            .where(Task.project_id.in_(ids))
+            .group_by(Task.project_id, Task.status),
         )
 
-    project_ids = [p.id for p in projects]
+        # { project_id: {"todo":0,"doing":0,"done":0} } を作る
+        # project が 0 件でも落ちない
+        project_stats = {pid: {"todo": 0, "doing": 0, "done": 0} for pid in project_ids}
+        for pid, status, cnt in stats_rows:
+            if status in ("todo", "doing", "done"):
+                project_stats[pid][status] = cnt
 
-    # projectごとの status 件数をまとめて取得（N+1回防止）
-    stats_rows = []
-    if project_ids:
-        stats_rows = (
-            db.session.query(Task.project_id, Task.status, func.count(Task.id))
-            .filter(Task.project_id.in_(project_ids))
-            .group_by(Task.project_id, Task.status)
-            .all()
-        )
+        for p in missing:
+            cards[p.id] = set_fragment(
+                f"project_card:{p.id}:{versions[p.id]}",
+                render_fragment("projects/_card.html", p=p, stats=project_stats[p.id]),
+            )
 
-    # { project_id: {"todo":0,"doing":0,"done":0} } を作る
-    # project が 0 件でも落ちない
-    project_stats = {pid: {"todo": 0, "doing": 0, "done": 0} for pid in project_ids}
-    for pid, status, cnt in stats_rows:
-        if status in ("todo", "doing", "done"):
-            project_stats[pid][status] = cnt
-
-    return render_template("projects/list.html", projects=projects, project_stats=project_stats)
+    return render_template("projects/list.html", projects=projects, cards=cards)
 
 @projects_bp.route("/create", methods=["GET", "POST"])
 @login_required
+@transactional
 def create_project():
 
     if request.method == "GET":
@@ -126,22 +107,22 @@ def create_project():
     name = request.form.get("name")
     description = request.form.get("description")
 
+    # プロジェクトとオーナーは1つのトランザクションで作る（オーナー不在のプロジェクトを残さない）
     project = Project(name=name, description=description)
     db.session.add(project)
-    db.session.commit()
+    db.session.flush()  # project.id を確定させる
 
-  
     pm = ProjectMember(project_id=project.id, user_id=current_user.id, role_in_project="owner")
     db.session.add(pm)
-    db.session.commit()
 
     return redirect(url_for("projects.list_projects"))
 
 
 @projects_bp.route("/<int:project_id>/members", methods=["GET", "POST"])
 @login_required
+@transactional
 def project_members(project_id):
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
 
     if not can_manage_members(project_id):
         return "権限がありません", 403
@@ -191,20 +172,50 @@ def project_members(project_id):
         
         pm = ProjectMember(project_id=project_id, user_id=user.id, role_in_project=role_in_project)
         db.session.add(pm)
-        db.session.commit()
 
         flash("追加しました", "success")
         return redirect(url_for("projects.project_members", project_id=project_id))
 
     # 一覧表示
-    members = ProjectMember.query.filter_by(project_id=project_id).all()
+    members = (
+        ProjectMember.query.options(joinedload(ProjectMember.user))
+        .filter_by(project_id=project_id)
+        .all()
+    )
     return render_template("projects/members.html", project=project, members=members, can_manage=can_manage_members(project_id))
 
 
+# メンバー追加フォームの入力候補（社員番号・名前の前方一致）
+@projects_bp.get("/<int:project_id>/members/search")
+@login_required
+def search_member_candidates(project_id):
+    if not can_manage_members(project_id):
+        return jsonify({"error": "権限がありません"}), 403
+
+    q = request.args.get("q", "")
+    limit = max(1, min(request.args.get("limit", USER_SEARCH_LIMIT, type=int), 50))
+    users = search_users(q, limit)
+
+    member_ids = set()
+    if users:
+        member_ids = {
+            user_id for (user_id,) in db.session.query(ProjectMember.user_id).filter(
+                ProjectMember.project_id == project_id,
+                ProjectMember.user_id.in_([u[0] for u in users]),
+            )
+        }
+
+    return jsonify([
+        {"employee_id": employee_id, "name": name, "is_member": user_id in member_ids}
+        for user_id, employee_id, name in users
+    ])
+
+
 @projects_bp.route("/<int:project_id>/members/<int:pm_id>/delete", methods=["POST"])
 @login_required
+@transactional
 def delete_project_member(project_id, pm_id):
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
 
     if not can_manage_members(project_id):
         return "権限がありません", 403
@@ -231,7 +242,7 @@ def delete_project_member(project_id, pm_id):
     # 落ちないように防御的に
     is_global_admin = (current_user.role == "admin")
 
-    me_pm = ProjectMember.query.filter_by(project_id=project_id, user_id=current_user.id).first()
+    me_pm = my_membership(project_id)
     my_role = me_pm.role_in_project if me_pm else None
 
     # pm.user が消えてる/存在しないケースも一応ガード
@@ -256,9 +267,11 @@ def delete_project_member(project_id, pm_id):
     # 実際の削除（失敗しても落とさない）
     try:
         db.session.delete(pm)
-        db.session.commit()
+        db.session.flush()
         flash("削除しました", "success")
     except SQLAlchemyError as e:
+        if is_busy_error(e):
+            raise  # ロック待ちは transactional でやり直す
         db.session.rollback()
         flash(f"削除に失敗しました：{e.__class__.__name__}", "error")
 
@@ -267,8 +280,9 @@ def delete_project_member(project_id, pm_id):
 
 @projects_bp.route("/<int:project_id>/members/<int:pm_id>/role", methods=["POST"])
 @login_required
+@transactional
 def update_project_member_role(project_id, pm_id):
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
 
     if not can_manage_members(project_id):
         return "権限がありません", 403
@@ -290,7 +304,6 @@ def update_project_member_role(project_id, pm_id):
         return redirect(url_for("projects.project_members", project_id=project_id))
 
     pm.role_in_project = new_role
-    db.session.commit()
 
     flash("権限を変更しました", "success")
     return redirect(url_for("projects.project_members", project_id=project_id))
@@ -302,47 +315,36 @@ def list_tasks(project_id):
     if not can_access_project(project_id):
         return "権限がありません", 403
 
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
 
-    priority_order = case(
-    (Task.priority == "high", 0),
-    (Task.priority == "mid", 1),
-    (Task.priority == "low", 2),
-    else_=9
-   )
-    
-    status_order = case(
-    (Task.status == "doing", 0),
-    (Task.status == "todo", 1),
-    (Task.status == "done", 2),
-    else_=9
-   )
-    
-    due_null_last = case(
-    (Task.due_date.is_(None), 1),
-    else_=0
-   )
-    
-    tasks = (Task.query.filter_by(project_id=project_id)
-    .order_by(
-        status_order.asc(),     # doing → todo → done
-        due_null_last.asc(),    # 期限あり → 期限なし
-        Task.due_date.asc(),    # 期限が近い順
-        priority_order.asc(),   # high → mid → low
-        Task.created_at.desc()  # 同条件なら新しい順
-     )
-    .all()
-   )
-    return render_template("tasks/list.html", project=project, tasks=tasks, today=date.today())
+    today = date.today()
+
+    def column_tasks(status):
+        # キャッシュが外れた列だけ読む
+        return task_cards(project_id, status)
+
+    # 期限表示（あと◯日）が日付で変わるので、キーには版番号と今日の日付を含める
+    version = cache_versions([project])[project.id]
+    columns = {
+        status: cached_fragment(
+            f"tasks:{project.id}:{version}:{today.isoformat()}:{status}",
+            lambda status=status: render_fragment(
+                "tasks/_column.html", project=project, status=status, tasks=column_tasks(status), today=today
+            ),
+        )
+        for status in (Task.STATUS_TODO, Task.STATUS_DOING, Task.STATUS_DONE)
+    }
+    return render_template("tasks/list.html", project=project, columns=columns)
 
 
 @projects_bp.route("/<int:project_id>/tasks/create", methods=["GET", "POST"])
 @login_required
+@transactional
 def create_task(project_id):
     if not can_access_project(project_id):
         return "権限がありません", 403
 
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
 
     if request.method == "GET":
         return render_template(
@@ -389,16 +391,73 @@ def create_task(project_id):
         description=description,
         priority=priority,
         due_date=due_date,
-        created_by=current_user.id
+        created_by=current_user.id,
+        rank=Task.rank_at_end(project_id, Task.STATUS_TODO),  # todo 列の末尾に追加
     )
     db.session.add(task)
-    db.session.commit()
+    db.session.flush()  # task.id を確定させる
+
+    TaskStatusEvent.record(task.id, project_id, None, task.status, current_user.id)
+    Project.bump_cache_version(project_id)
+    forget_summary(current_user.id)
 
     return redirect(url_for("projects.list_tasks", project_id=project_id))
 
 
+# CSV からタスクを一括登録する
+@projects_bp.route("/<int:project_id>/tasks/import", methods=["GET", "POST"])
+@login_required
+def import_tasks(project_id):
+    if not can_access_project(project_id):
+        return "権限がありません", 403
+
+    project = get_project_or_404(project_id)
+
+    if request.method == "GET":
+        return render_template("tasks/import.html", project=project, columns=IMPORT_COLUMNS)
+
+    file = request.files.get("file")
+    if file is None or not file.filename:
+        return render_template(
+            "tasks/import.html",
+            project=project,
+            columns=IMPORT_COLUMNS,
+            error="CSVファイルを選択してください"
+        )
+
+    encoding = request.form.get("encoding", "utf-8-sig")
+    if encoding not in ("utf-8-sig", "cp932"):
+        encoding = "utf-8-sig"
+
+    def work():
+        # アップロードをまるごと読まず、行単位で読み進める
+        # （ロック待ちでやり直すときは先頭から読み直す）
+        file.stream.seek(0)
+        stream = io.TextIOWrapper(file.stream, encoding=encoding, newline="")
+        try:
+            result = import_tasks_csv(
+                stream,
+                project_id=project.id,
+                created_by=current_user.id,
+                all_or_nothing=bool(request.form.get("all_or_nothing")),
+            )
+        finally:
+            stream.detach()  # ラッパーの破棄と一緒に file.stream が閉じられないようにする
+        forget_summary(current_user.id)
+        return result
+
+    # 中止（ImportAborted）のときもエラー一覧を表示したいので、transactional ではなくここで境界を持つ
+    try:
+        result = run_in_transaction(work)
+    except ImportAborted as e:
+        result = e.result
+
+    return render_template("tasks/import.html", project=project, columns=IMPORT_COLUMNS, result=result)
+
+
 @projects_bp.post("/<int:project_id>/tasks/<int:task_id>/status")
 @login_required
+@transactional
 def change_task_status(project_id, task_id):
     if not can_access_project(project_id):
         return "権限がありません", 403
@@ -406,6 +465,12 @@ def change_task_status(project_id, task_id):
     task = Task.query.filter_by(id=task_id, project_id=project_id).first_or_404()
 
     action = request.form.get("action")
+    # 画面に表示していたときの版番号（無ければ今読んだ版で更新する）
+    expected_version = request.form.get("version", type=int)
+    from_status = task.status
+
+    if expected_version is not None and expected_version != task.version:
+        return _task_conflict(project_id, task)
 
     if action == "start":
         task.status = "doing"
@@ -419,29 +484,206 @@ def change_task_status(project_id, task_id):
         task.status = "todo"
         task.done_at = None
 
-    db.session.commit()
+    try:
+        # 履歴はステータス更新と同じトランザクションで書く
+        if task.status != from_status:
+            task.rank = Task.rank_at_end(project_id, task.status)  # 移動先の列の末尾へ
+            TaskStatusEvent.record(task.id, project_id, from_status, task.status, current_user.id)
+
+        Project.bump_cache_version(project_id)
+        forget_summary(current_user.id)
+        # UPDATE ... WHERE id = ? AND version = ?（読んでから書くまでの間に更新されていたら0件）
+        db.session.flush()
+    except StaleDataError:
+        db.session.rollback()
+        task = Task.query.filter_by(id=task_id, project_id=project_id).first_or_404()
+        return _task_conflict(project_id, task)
 
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"task": _task_state(task)})
     return redirect(url_for("projects.list_tasks", project_id=project_id))
 
 
+def _task_state(task) -> dict:
+    return {
+        "id": task.id,
+        "status": task.status,
+        "rank": task.rank,
+        "version": task.version,
+        "done_at": task.done_at.isoformat() if task.done_at else None,
+        "updated_at": task.updated_at.isoformat() if task.updated_at else None,
+    }
+
+
+def _task_conflict(project_id, task):
+    """他の人が先に更新していたときの 409。上書きせず、今の状態を返す。"""
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"error": "conflict", "task": _task_state(task)}), 409
+
+    flash(f"「{task.title}」は他のユーザーが先に更新しました（現在：{task.status}）。最新の状態を表示しています。", "error")
+    return list_tasks(project_id), 409
+
+
+# 列内での並べ替え。書き換えるのは動かしたカードの rank だけ
+@projects_bp.post("/<int:project_id>/tasks/<int:task_id>/move")
+@login_required
+@transactional
+def move_task(project_id, task_id):
+    if not can_access_project(project_id):
+        return "権限がありません", 403
+
+    task = Task.query.filter_by(id=task_id, project_id=project_id).first_or_404()
+
+    expected_version = request.form.get("version", type=int)
+    if expected_version is not None and expected_version != task.version:
+        return _task_conflict(project_id, task)
+
+    same_column = Task.query.filter(
+        Task.project_id == project_id,
+        Task.status == task.status,
+        Task.id != task.id,
+    )
+    direction = request.form.get("direction")
+
+    try:
+        if direction == "up":
+            # すぐ上の2件の間に入れる
+            above = same_column.filter(Task.rank < task.rank).order_by(Task.rank.desc()).limit(2).all()
+            if not above:
+                return _task_moved(project_id, task)
+            new_rank = rank_between(above[1].rank if len(above) > 1 else None, above[0].rank)
+
+        elif direction == "down":
+            below = same_column.filter(Task.rank > task.rank).order_by(Task.rank.asc()).limit(2).all()
+            if not below:
+                return _task_moved(project_id, task)
+            new_rank = rank_between(below[0].rank, below[1].rank if len(below) > 1 else None)
+
+        else:
+            # ドラッグ＆ドロップ用：移動先の上（before_id）と下（after_id）のカードを指定する
+            before_id = request.form.get("before_id", type=int)
+            after_id = request.form.get("after_id", type=int)
+            if before_id is None and after_id is None:
+                abort(400)
+
+            before = same_column.filter(Task.id == before_id).first() if before_id is not None else None
+            after = same_column.filter(Task.id == after_id).first() if after_id is not None else None
+            if (before_id is not None and before is None) or (after_id is not None and after is None):
+                # 隣のカードが別の列に移った・削除された
+                return _task_conflict(project_id, task)
+            if before is not None and after is not None and before.rank > after.rank:
+                # 画面を開いた後に並びが変わっている
+                return _task_conflict(project_id, task)
+            new_rank = rank_between(before.rank if before else None, after.rank if after else None)
+    except ValueError:
+        # 同じ順位のカードが並んでいて間に入れられない（同時に末尾へ追加されたときなど）
+        return _rank_tie(project_id, task)
+
+    task.rank = new_rank
+
+    try:
+        Project.bump_cache_version(project_id)
+        db.session.flush()
+    except StaleDataError:
+        db.session.rollback()
+        task = Task.query.filter_by(id=task_id, project_id=project_id).first_or_404()
+        return _task_conflict(project_id, task)
+
+    # 間に挿入し続けて順位が長くなったら、列ごと振り直す（1列1件まで）
+    if len(new_rank) > current_app.config["TASK_RANK_MAX_LENGTH"]:
+        _rebalance_column(project_id, task)
+
+    return _task_moved(project_id, task)
+
+
+def _rebalance_column(project_id, task):
+    """
+    task の列の順位を振り直す。ワーカーがいればジョブに回し（1列1件まで）、
+    いなければ登録しても実行されないので、このトランザクションの中で振り直す。
+    """
+    if has_workers():
+        enqueue_once("rebalance_ranks", {"project_id": project_id, "status": task.status}, commit=False)
+        return False
+    rebalance_ranks(project_id, task.status)
+    # 一括 UPDATE で上がった version / rank を読み直す
+    db.session.refresh(task)
+    return True
+
+
+def _rank_tie(project_id, task):
+    """列の順位を振り直して 409 を返す。振り直しが終われば（返した version で）同じ操作で動かせる。"""
+    done = _rebalance_column(project_id, task)
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"error": "rank_tie", "task": _task_state(task)}), 409
+
+    if done:
+        flash("並び順を整理しました。もう一度移動してください。", "error")
+    else:
+        flash("並び順を整理しています。少し待ってからもう一度移動してください。", "error")
+    return redirect(url_for("projects.list_tasks", project_id=project_id))
+
+
+def _task_moved(project_id, task):
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"task": _task_state(task)})
+    return redirect(url_for("projects.list_tasks", project_id=project_id))
+
+
+# バーンダウン・累積フロー・サイクルタイム
+@projects_bp.get("/<int:project_id>/analytics")
+@login_required
+def project_analytics(project_id):
+    if not can_access_project(project_id):
+        return "権限がありません", 403
+
+    project = get_project_or_404(project_id)
+
+    days = request.args.get("days", 30, type=int)
+    days = min(max(days, 1), 365)
+
+    # 前回以降の履歴を足し込み（間隔をあけて・ワーカーがいればジョブで）、日次スナップショットを days 行読む
+    refresh_snapshots(project.id)
+    snapshots = load_snapshots(project.id, days)
+
+    if request.args.get("format") == "json":
+        return jsonify([
+            {
+                "day": s.day.isoformat(),
+                "todo": s.todo_count,
+                "doing": s.doing_count,
+                "done": s.done_count,
+                "remaining": s.todo_count + s.doing_count,
+                "completed": s.completed_count,
+                "cycle_time_p50_hours": s.cycle_time_p50_hours,
+                "cycle_time_p90_hours": s.cycle_time_p90_hours,
+            }
+            for s in snapshots
+        ])
+
+    max_total = max((s.todo_count + s.doing_count + s.done_count for s in snapshots), default=0)
+    return render_template(
+        "projects/analytics.html",
+        project=project,
+        snapshots=snapshots,
+        days=days,
+        max_total=max_total,
+    )
+
+
 @projects_bp.route("/<int:project_id>/journal", methods=["GET", "POST"])
 @login_required
 def project_journal(project_id):
     if not can_access_project(project_id):
         return "権限がありません", 403
 
-    project = Project.query.get_or_404(project_id)
-
-    # 保存先フォルダ：instance/journals/
-    journal_dir = os.path.join(current_app.instance_path, "journals")
-    os.makedirs(journal_dir, exist_ok=True)
+    project = get_project_or_404(project_id)
 
-    # プロジェクトごとのテキストファイル
-    journal_path = os.path.join(journal_dir, f"project_{project_id}.txt")
+    # プロジェクトごとのテキストファイル（instance/journals/）
+    path = journal_path(project_id)
 
     def load_text():
-        if os.path.exists(journal_path):
-            with open(journal_path, "r", encoding="utf-8") as f:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
                 return f.read()
         return ""
 
@@ -454,7 +696,7 @@ def project_journal(project_id):
             key = e["task_title"] if e["task_id"] else "共通"
             grouped.setdefault(key, []).append(e)
 
-        tasks = Task.query.filter_by(project_id=project_id).order_by(Task.created_at.desc()).all()
+        tasks = task_options(project_id)  # 選択肢に使う id とタイトルだけ
         return render_template("journal/index.html", project=project, grouped=grouped, tasks=tasks, error=error)
 
     if request.method == "POST":
@@ -480,7 +722,7 @@ def project_journal(project_id):
         header = f"\n[{now_str}] {who}{task_part}\n"
         body = content + "\n"
 
-        with open(journal_path, "a", encoding="utf-8") as f:
+        with open(path, "a", encoding="utf-8") as f:
             f.write(header)
             f.write(body)
 
@@ -497,16 +739,60 @@ def clear_project_journal(project_id):
     if current_user.role != "admin":
         return "権限がありません", 403
 
-    project = Project.query.get_or_404(project_id)
+    project = get_project_or_404(project_id)
 
-    journal_dir = os.path.join(current_app.instance_path, "journals")
+    with open(journal_path(project_id), "w", encoding="utf-8") as f:
+        f.write("")
 
-    os.makedirs(journal_dir, exist_ok=True)
+    flash("日記を削除しました。", "success")
+    return redirect(url_for("projects.project_journal", project_id=project_id))
 
-    journal_path = os.path.join(journal_dir, f"project_{project_id}.txt")
 
-    with open(journal_path, "w", encoding="utf-8") as f:
-        f.write("")
+# タスク・日誌のエクスポート（CSV / JSONL）
+@projects_bp.get("/<int:project_id>/export/<any(tasks, journal):kind>.<fmt>")
+@login_required
+def export_project(project_id, kind, fmt):
+    if not can_access_project(project_id):
+        return "権限がありません", 403
 
-    flash("日記を削除しました。", "success")
-    return redirect(url_for("projects.project_journal", project_id=project_id))
\ No newline at end of file
+    project = get_project_or_404(project_id)
+
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    # 全件をメモリに載せず、読んだそばから送り出す
+    body = stream_export(kind, fmt, project.id)
+    filename = f"project_{project.id}_{kind}.{fmt}"
+
+    return Response(
+        stream_with_context(body),
+        content_type=EXPORT_FORMATS[fmt],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# 大きなエクスポートはバックグラウンドで作り、/jobs/<id> をポーリングしてから取りに来てもらう
+@projects_bp.post("/<int:project_id>/export/<any(tasks, journal):kind>.<fmt>/jobs")
+@login_required
+@transactional
+def export_project_async(project_id, kind, fmt):
+    if not can_access_project(project_id):
+        return "権限がありません", 403
+
+    project = get_project_or_404(project_id)
+
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    job = enqueue(
+        "export",
+        {"kind": kind, "format": fmt, "project_id": project.id},
+        created_by=current_user.id,
+        commit=False,  # transactional が commit する
+    )
+    status_url = url_for("jobs.job_status", job_id=job.id)
+
+    return jsonify({**job.to_dict(), "status_url": status_url}), 202, {"Location": status_url}
@@ -0,0 +1,210 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import click
+from .extensions import db
+from .analytics import build_snapshots
+from .assets import brotli, build_assets
+from .exporters import EXPORT_FORMATS, stream_export
+from .importers import ImportAborted, import_tasks_csv
+from .index_advisor import advise
+from .jobs import enqueue, run_pending, start_workers
+from .migrate import MIGRATIONS, applied_versions, pending_shard_migrations, run_migrations, shard_engine, shard_paths
+from .sharding import copy_project_to_shard, get_router, use_shard
+from .startup import MEASURE_SCRIPT, precompile_templates
+from .transactions import run_in_transaction
+
+
+def register_cli(app):
+    """flask コマンドにアプリ独自のサブコマンドを登録する。"""
+
+    @app.cli.command("export-tasks")
+    @click.argument("project_id", type=int)
+    @click.option("--format", "fmt", type=click.Choice(sorted(EXPORT_FORMATS)), default="csv", show_default=True)
+    @click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-", help="出力先（省略時は標準出力）")
+    def export_tasks(project_id, fmt, output):
+        """プロジェクトのタスクを CSV / JSONL で書き出す。"""
+        with use_shard(project_id):
+            for chunk in stream_export("tasks", fmt, project_id):
+                output.write(chunk)
+
+    @app.cli.command("export-journal")
+    @click.argument("project_id", type=int)
+    @click.option("--format", "fmt", type=click.Choice(sorted(EXPORT_FORMATS)), default="csv", show_default=True)
+    @click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-", help="出力先（省略時は標準出力）")
+    def export_journal(project_id, fmt, output):
+        """プロジェクトの日誌を CSV / JSONL で書き出す。"""
+        with use_shard(project_id):
+            for chunk in stream_export("journal", fmt, project_id):
+                output.write(chunk)
+
+    @app.cli.command("import-tasks")
+    @click.argument("project_id", type=int)
+    @click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--encoding", type=click.Choice(["utf-8-sig", "cp932"]), default="utf-8-sig", show_default=True)
+    @click.option("--created-by", "created_by_employee_id", type=int, required=True, help="作成者の社員番号")
+    @click.option("--all-or-nothing", is_flag=True, help="エラーが1件でもあれば全件取り込まない")
+    def import_tasks(project_id, csv_path, encoding, created_by_employee_id, all_or_nothing):
+        """CSV からタスクを一括登録する。"""
+        from .models.project import Project
+        from .models.user import User
+
+        if db.session.get(Project, project_id) is None:
+            raise click.ClickException(f"プロジェクトが見つかりません（{project_id}）")
+
+        creator = User.query.filter_by(employee_id=created_by_employee_id).first()
+        if creator is None:
+            raise click.ClickException(f"ユーザーが見つかりません（社員番号 {created_by_employee_id}）")
+
+        def work():
+            # ロック待ちでやり直すときはファイルを開き直す
+            with open(csv_path, "r", encoding=encoding, newline="") as f, use_shard(project_id):
+                return import_tasks_csv(f, project_id, creator.id, all_or_nothing=all_or_nothing)
+
+        try:
+            result = run_in_transaction(work, label="cli.import-tasks")
+        except ImportAborted as e:
+            result = e.result
+
+        for line_no, message in result.errors:
+            click.echo(f"{line_no}行目：{message}", err=True)
+        if result.rolled_back:
+            raise click.ClickException(f"取り込みを中止しました（エラー {result.error_count}件）")
+        click.echo(f"{result.inserted}件を登録しました（エラー {result.error_count}件）")
+
+    @app.cli.command("precompile-templates")
+    def precompile_templates_command():
+        """全テンプレートをコンパイルしてバイトコードキャッシュに書き出す（デプロイ時に実行）。"""
+        if not app.config.get("JINJA_BYTECODE_CACHE_DIR"):
+            raise click.ClickException("JINJA_BYTECODE_CACHE_DIR が設定されていません")
+        count, seconds = precompile_templates(app)
+        click.echo(f"{count}件のテンプレートをコンパイルしました（{seconds * 1000:.0f}ms）")
+
+    @app.cli.command("startup-report")
+    @click.option("--runs", default=3, show_default=True, help="計測回数")
+    def startup_report(runs):
+        """新しいプロセスでの import / create_app / 最初のリクエストの時間を計測する。"""
+        for i in range(runs):
+            out = subprocess.run(
+                [sys.executable, "-c", MEASURE_SCRIPT],
+                cwd=os.path.dirname(app.root_path),
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            timings = json.loads(out.strip().splitlines()[-1])
+            click.echo(
+                f"#{i + 1} import={timings['import_ms']}ms "
+                f"create_app={timings['create_app_ms']}ms "
+                f"first_request={timings['first_request_ms']}ms "
+                f"total={timings['time_to_first_response_ms']}ms"
+            )
+
+    @app.cli.command("db-migrate")
+    @click.option("--target", type=int, default=None, help="このバージョンまで適用する")
+    def db_migrate(target):
+        """未適用のスキーマ変更（インデックス・列の追加など）を順に適用する。"""
+        count = run_migrations(target=target, echo=click.echo)
+        click.echo(f"{count}件のマイグレーションを適用しました")
+
+    @app.cli.command("db-status")
+    def db_status():
+        """マイグレーションの適用状況を表示する。"""
+        done = applied_versions()
+        for version, description, _ in MIGRATIONS:
+            mark = "済" if version in done else "未"
+            click.echo(f"[{mark}] {version}: {description}")
+        for path in shard_paths():
+            engine = shard_engine(path)
+            pending = [version for version, _, _ in pending_shard_migrations(engine)]
+            engine.dispose()
+            if pending:
+                click.echo(f"[未] {os.path.basename(path)}: {', '.join(map(str, pending))}")
+
+    @app.cli.command("index-advisor")
+    @click.option("--verbose", "-v", is_flag=True, help="問題のないクエリの実行計画も表示する")
+    def index_advisor(verbose):
+        """アプリのクエリを EXPLAIN QUERY PLAN にかけ、全件スキャン・一時ソートを報告する。"""
+        issues = 0
+        for name, sql, plan, problems in advise():
+            if not problems and not verbose:
+                continue
+            click.echo(f"== {name}")
+            click.echo(f"   {sql}".replace("\n", " "))
+            for detail in plan:
+                click.echo(f"   | {detail}")
+            for problem in problems:
+                click.echo(f"   ! {problem}")
+            issues += len(problems)
+        click.echo(f"問題のある実行計画：{issues}件")
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """static/ の CSS/JS にハッシュ付きファイル名を付け、圧縮版と一緒に static/dist/ に書き出す。"""
+        manifest = build_assets(app)
+        for src, hashed in sorted(manifest.items()):
+            click.echo(f"{src} -> {hashed}")
+        encodings = "gzip, brotli" if brotli is not None else "gzip"
+        click.echo(f"{len(manifest)}件をビルドしました（{encodings}）")
+
+    @app.cli.command("build-snapshots")
+    @click.option("--project-id", type=int, default=None, help="省略時は全プロジェクト")
+    @click.option("--enqueue", "as_job", is_flag=True, help="その場で作らずジョブとして登録する")
+    def build_snapshots_command(project_id, as_job):
+        """ステータス履歴から日次スナップショット（project_daily_stats）を作り足す。"""
+        from .models.project import Project
+
+        if project_id is not None:
+            project_ids = [project_id]
+        else:
+            project_ids = [pid for (pid,) in db.session.query(Project.id).order_by(Project.id)]
+
+        if as_job:
+            for pid in project_ids:
+                enqueue("build_snapshots", {"project_id": pid})
+            click.echo(f"{len(project_ids)}件のジョブを登録しました")
+            return
+
+        total = 0
+        for pid in project_ids:
+            with use_shard(pid):
+                total += build_snapshots(pid)
+        click.echo(f"{len(project_ids)}プロジェクト・{total}日分を更新しました")
+
+    @app.cli.command("shard-tasks")
+    def shard_tasks_command():
+        """TASK_SHARDING=1 に切り替えたとき、メイン DB のタスクをプロジェクトごとのシャードへ移す。"""
+        from .models.project import Project
+
+        if get_router() is None:
+            raise click.ClickException("TASK_SHARDING=1 で実行してください")
+
+        project_ids = [pid for (pid,) in db.session.query(Project.id).order_by(Project.id)]
+        total = 0
+        for pid in project_ids:
+            copied = copy_project_to_shard(pid)
+            total += copied
+            click.echo(f"project {pid}: {copied}件")
+        click.echo(f"{len(project_ids)}プロジェクト・{total}件のタスクを移しました")
+
+    @app.cli.command("worker")
+    @click.option("--threads", type=int, default=1, show_default=True, help="ワーカースレッド数")
+    @click.option("--burst", is_flag=True, help="キューが空になったら終了する")
+    def worker_command(threads, burst):
+        """バックグラウンドジョブを処理する（Ctrl+C で終了）。"""
+        if burst:
+            click.echo(f"{run_pending(app)}件のジョブを処理しました")
+            return
+
+        workers = start_workers(app, threads)
+        click.echo(f"ワーカーを{threads}スレッドで起動しました")
+        try:
+            while any(w.is_alive() for w in workers):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            for w in workers:
+                w.stop()
+            for w in workers:
+                w.join()
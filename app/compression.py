@@ -0,0 +1,147 @@
+import gzip
+import zlib
+from flask import request
+from . import metrics
+from .assets import brotli
+
+metrics.register_counter("app_compression_bytes_in_total", "圧縮前のレスポンスのバイト数", ("encoding",))
+metrics.register_counter("app_compression_bytes_out_total", "圧縮後のレスポンスのバイト数", ("encoding",))
+
+# 圧縮するレスポンスの種類（画像・圧縮済みファイルなどは対象外）
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+}
+
+
+def choose_encoding(accept_encodings):
+    """
+    Accept-Encoding の q 値がいちばん高い方式を選ぶ（同じ q なら br → gzip の順）。
+    どちらも受け付けない（q=0）なら None。
+    """
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    best, best_q = None, 0
+    for encoding in candidates:
+        q = accept_encodings[encoding]
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    """gzip / brotli の増分圧縮。feed() は渡した分をすぐ送れるところまで出力する。"""
+
+    def __init__(self, encoding: str, config):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=config["COMPRESSION_BROTLI_QUALITY"])
+        else:
+            # wbits=31 で gzip 形式（ヘッダー・CRC 付き）
+            self._gz = zlib.compressobj(config["COMPRESSION_GZIP_LEVEL"], zlib.DEFLATED, 31)
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        # Z_SYNC_FLUSH で区切ると、ここまでの分をブラウザがすぐ展開できる
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush(zlib.Z_FINISH)
+
+
+def compress(data: bytes, encoding: str, config) -> bytes:
+    """まとめて圧縮する（ストリーミングでないレスポンス用）。"""
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESSION_BROTLI_QUALITY"])
+    return gzip.compress(data, compresslevel=config["COMPRESSION_GZIP_LEVEL"], mtime=0)
+
+
+def _compress_stream(chunks, encoding: str, config):
+    """
+    ストリーミングのレスポンスを1チャンクずつ圧縮して流す（全体をためない）。
+    小さいチャンクは COMPRESSION_STREAM_BUFFER バイトたまるまでまとめてから圧縮する。
+    """
+    compressor = _Compressor(encoding, config)
+    buffer_size = config["COMPRESSION_STREAM_BUFFER"]
+    pending = []
+    pending_size = 0
+    bytes_in = bytes_out = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= buffer_size:
+                data = b"".join(pending)
+                pending, pending_size = [], 0
+                out = compressor.feed(data)
+                bytes_in += len(data)
+                bytes_out += len(out)
+                yield out
+        data = b"".join(pending)
+        out = compressor.feed(data) + compressor.finish() if data else compressor.finish()
+        bytes_in += len(data)
+        bytes_out += len(out)
+        yield out
+    finally:
+        metrics.inc("app_compression_bytes_in_total", (encoding,), bytes_in)
+        metrics.inc("app_compression_bytes_out_total", (encoding,), bytes_out)
+
+
+def init_compression(app):
+    """
+    HTML / JSON / CSV などのレスポンスを Accept-Encoding に合わせて gzip / brotli で圧縮する。
+
+    - COMPRESSION_MIN_SIZE バイト未満の本文はそのまま返す（圧縮しても小さくならない）
+    - すでに Content-Encoding があるもの（/assets の .gz / .br）や send_file はそのまま
+    - ストリーミングのレスポンスはためずに少しずつ圧縮して流す
+    """
+    if not app.config.get("COMPRESSION_ENABLED"):
+        return
+
+    config = app.config
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            request.method == "HEAD"
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        if not response.is_streamed and response.calculate_content_length() < config["COMPRESSION_MIN_SIZE"]:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            source = response.response
+            response.response = _compress_stream(response.iter_encoded(), encoding, config)
+            # 差し替えた後も、元のイテラブル（stream_with_context など）の後始末は呼ばれるようにする
+            if hasattr(source, "close"):
+                response.call_on_close(source.close)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            compressed = compress(data, encoding, config)
+            response.set_data(compressed)
+            metrics.inc("app_compression_bytes_in_total", (encoding,), len(data))
+            metrics.inc("app_compression_bytes_out_total", (encoding,), len(compressed))
+
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -10,4 +10,82 @@ class Config:
     DEFAULT_DB_URI = "sqlite:///" + DEFAULT_DB_PATH.as_posix()  # ← C:/... 形式
 
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", DEFAULT_DB_URI)
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLプロファイラ（リクエストごとのクエリ数・DB時間・N+1検出）
+    SQL_PROFILER_ENABLED = os.getenv("SQL_PROFILER_ENABLED", "1") == "1"
+    SQL_PROFILER_SAMPLE_RATE = float(os.getenv("SQL_PROFILER_SAMPLE_RATE", "1.0"))
+    SQL_PROFILER_SLOWEST = 5
+    SQL_PROFILER_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_PROFILER_N_PLUS_ONE_THRESHOLD", "5"))
+
+    # メトリクス（/metrics、Prometheus 形式）
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_DIR = os.getenv("METRICS_DIR", (BASE_DIR / ".." / "instance" / "metrics").resolve().as_posix())
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # 設定するとBearerトークンでも取得できる
+
+    # Jinja のバイトコードキャッシュ（空文字で無効）
+    JINJA_BYTECODE_CACHE_DIR = os.getenv(
+        "JINJA_BYTECODE_CACHE_DIR",
+        (BASE_DIR / ".." / "instance" / "jinja_cache").resolve().as_posix(),
+    )
+
+    # フラグメントキャッシュ（カンバン列・プロジェクトカード）
+    FRAGMENT_CACHE_ENABLED = os.getenv("FRAGMENT_CACHE_ENABLED", "1") == "1"
+    FRAGMENT_CACHE_MAX_BYTES = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    FRAGMENT_CACHE_BACKEND = os.getenv("FRAGMENT_CACHE_BACKEND", "memory")  # memory / sqlite
+    FRAGMENT_CACHE_PATH = os.getenv(
+        "FRAGMENT_CACHE_PATH",
+        (BASE_DIR / ".." / "instance" / "fragment_cache.db").resolve().as_posix(),
+    )
+    FRAGMENT_CACHE_SHARED_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_SHARED_MAX_ENTRIES", "20000"))
+
+    # バックグラウンドジョブ（0 のときは flask worker を別プロセスで動かす）
+    JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "0"))
+    # JOBS_WORKERS=0 でも flask worker を別に動かしているなら 1（ジョブに回せる処理をジョブにする）
+    JOBS_EXTERNAL_WORKER = os.getenv("JOBS_EXTERNAL_WORKER", "0") == "1"
+    JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+    JOBS_LOCK_TIMEOUT = float(os.getenv("JOBS_LOCK_TIMEOUT", "600"))
+    JOBS_RETRY_BASE_SECONDS = float(os.getenv("JOBS_RETRY_BASE_SECONDS", "5"))
+    JOBS_RETRY_MAX_SECONDS = float(os.getenv("JOBS_RETRY_MAX_SECONDS", "600"))
+    JOBS_EXPORT_DIR = os.getenv("JOBS_EXPORT_DIR", (BASE_DIR / ".." / "instance" / "exports").resolve().as_posix())
+
+    # 書き込み中に SQLite のロックに当たったときのやり直し（transactional）
+    DB_BUSY_RETRIES = int(os.getenv("DB_BUSY_RETRIES", "5"))
+    DB_BUSY_BACKOFF_BASE = float(os.getenv("DB_BUSY_BACKOFF_BASE", "0.02"))
+    DB_BUSY_BACKOFF_MAX = float(os.getenv("DB_BUSY_BACKOFF_MAX", "0.5"))
+
+    # カンバンの並び順（rank）がこの文字数を超えたら、その列をジョブで振り直す
+    TASK_RANK_MAX_LENGTH = int(os.getenv("TASK_RANK_MAX_LENGTH", "16"))
+
+    # メンバー追加の候補検索（前方一致インデックス）を全件読み直す間隔（秒、0 で読み直さない）
+    USER_SEARCH_INDEX_TTL = float(os.getenv("USER_SEARCH_INDEX_TTL", "300"))
+
+    # ログインユーザーをセッションのスナップショットから復元する時間（秒、0 で毎回 DB から読む）
+    USER_SNAPSHOT_TTL = float(os.getenv("USER_SNAPSHOT_TTL", "60"))
+    # 権限・停止などを変えたときに更新時刻を進めるユーザーごとのファイルの置き場所
+    # （全ワーカーで、そのユーザーのスナップショットだけを無効にする）
+    USER_SNAPSHOT_EPOCH_DIR = os.getenv(
+        "USER_SNAPSHOT_EPOCH_DIR",
+        (BASE_DIR / ".." / "instance" / "auth_epochs").resolve().as_posix(),
+    )
+
+    # プロジェクトごとのタスクを別の SQLite ファイルに置く（書き込みが他のプロジェクトを待たない）
+    TASK_SHARDING = os.getenv("TASK_SHARDING", "0") == "1"
+    TASK_SHARDS_DIR = os.getenv("TASK_SHARDS_DIR", (BASE_DIR / ".." / "instance" / "shards").resolve().as_posix())
+
+    # 分析画面から日次スナップショットを作り足す間隔（秒、プロジェクトごと）
+    ANALYTICS_REFRESH_INTERVAL = float(os.getenv("ANALYTICS_REFRESH_INTERVAL", "60"))
+
+    # ダッシュボードの集計をユーザーごとにキャッシュする時間（秒、0 で毎回集計）
+    DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+
+    # HTML / JSON / CSV などのレスポンスを gzip（brotli があれば br）で圧縮する
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+    # これより小さい本文は圧縮しない（バイト）
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    # gzip の圧縮レベル（1〜9）と brotli の品質（0〜11）。上げるほど小さくなるが CPU を使う
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    # ストリーミング（エクスポート）でこのバイト数たまるごとに圧縮して送る
+    COMPRESSION_STREAM_BUFFER = int(os.getenv("COMPRESSION_STREAM_BUFFER", "8192"))
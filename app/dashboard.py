@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import case, event, func, select
+from .analytics import JST_OFFSET, jst_today
+from .extensions import db
+from .models.project_member import ProjectMember
+from .models.task import Task
+from .sharding import fan_out, get_router
+
+# ダッシュボードに出す数（すべて「行を足し合わせれば全体の値」になるもの）
+SUMMARY_KEYS = (
+    "project_count",
+    "total_task_count",
+    "todo_count",
+    "doing_count",
+    "done_count",
+    "my_open_count",
+    "my_overdue_count",
+    "my_done_this_week_count",
+)
+
+# user_id → (期限（monotonic）, 集計結果)
+_cache = {}
+# user_id → 書き込みで捨てた回数（集計中に書き込みがあったら、その結果はキャッシュしない）
+_generations = {}
+_cache_lock = threading.Lock()
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def summary_statement(user_id: int, today, week_start, project_ids=None):
+    """
+    所属プロジェクトのタスクを1回の条件付き集計（SUM(CASE ...)）で数える SELECT。
+    project_members を起点に tasks を LEFT JOIN するので、タスクが無いプロジェクトも数に入る。
+    """
+    mine = Task.assignee_id == user_id
+    is_open = Task.status != Task.STATUS_DONE
+
+    my_projects = ProjectMember.user_id == user_id
+    if project_ids is not None:
+        my_projects = my_projects & ProjectMember.project_id.in_(project_ids)
+    # JOIN 後の行はタスク単位なので、プロジェクト数は COUNT(DISTINCT) ではなくスカラーサブクエリで数える
+    project_count = (
+        select(func.count()).select_from(ProjectMember).where(my_projects).correlate(None).scalar_subquery()
+    )
+
+    stmt = (
+        select(
+            project_count,
+            func.count(Task.id),
+            _count_if(Task.status == Task.STATUS_TODO),
+            _count_if(Task.status == Task.STATUS_DOING),
+            _count_if(Task.status == Task.STATUS_DONE),
+            _count_if(mine & is_open),
+            _count_if(mine & is_open & (Task.due_date < today)),
+            _count_if(mine & (Task.status == Task.STATUS_DONE) & (Task.done_at >= week_start)),
+        )
+        .select_from(ProjectMember)
+        .outerjoin(Task, Task.project_id == ProjectMember.project_id)
+        .where(my_projects)
+    )
+    return stmt
+
+
+def build_summary(user_id: int) -> dict:
+    """
+    ダッシュボードの数を DB から集計する。
+    シャードモードではプロジェクトごとのシャードで同じ集計をして足し合わせる。
+    """
+    today = jst_today()
+    # 今週（日本時間の月曜 0:00 以降）に完了したもの。done_at は UTC
+    week_start = datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time()) - JST_OFFSET
+
+    if get_router() is None:
+        rows = [db.session.execute(summary_statement(user_id, today, week_start)).one()]
+    else:
+        project_ids = [
+            pid for (pid,) in db.session.query(ProjectMember.project_id)
+            .filter(ProjectMember.user_id == user_id)
+        ]
+        rows = fan_out(project_ids, lambda ids: summary_statement(user_id, today, week_start, ids))
+
+    summary = {key: sum(row[i] or 0 for row in rows) for i, key in enumerate(SUMMARY_KEYS)}
+    summary["open_task_count"] = summary["todo_count"] + summary["doing_count"]
+    return summary
+
+
+def load_summary(user_id: int) -> dict:
+    """DASHBOARD_CACHE_TTL 秒はプロセス内にキャッシュした集計を返す（0 で毎回集計）。"""
+    ttl = current_app.config["DASHBOARD_CACHE_TTL"]
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        generation = _generations.get(user_id, 0)
+    if ttl > 0 and cached is not None and cached[0] > now:
+        return cached[1]
+
+    summary = build_summary(user_id)
+    if ttl > 0:
+        with _cache_lock:
+            if _generations.get(user_id, 0) == generation:
+                _cache[user_id] = (now + ttl, summary)
+    return summary
+
+
+def forget_summary(user_id: int):
+    """
+    自分のタスクを書き換えたときに呼ぶ。commit が成功した後で自分のキャッシュを捨てる
+    （他のメンバーの画面は TTL が切れるまで前の数のまま）。
+    """
+    db.session.info.setdefault("dashboard_users", set()).add(user_id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _forget_committed(session):
+    user_ids = session.info.pop("dashboard_users", None)
+    if user_ids:
+        with _cache_lock:
+            for user_id in user_ids:
+                _cache.pop(user_id, None)
+                _generations[user_id] = _generations.get(user_id, 0) + 1
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("dashboard_users", None)
@@ -0,0 +1,162 @@
+import csv
+import json
+import os
+from datetime import date, datetime
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from .extensions import db
+from .journal import iter_journal_entries, journal_path
+from .models.task import Task
+from .models.user import User
+
+# 1回のDB往復で取り出す行数（server-side cursor + yield_per）
+EXPORT_BATCH_SIZE = 1000
+
+# 何行ぶんまとめて1チャンクとして送るか
+EXPORT_CHUNK_ROWS = 200
+
+TASK_EXPORT_COLUMNS = [
+    "id",
+    "title",
+    "description",
+    "status",
+    "priority",
+    "due_date",
+    "assignee_employee_id",
+    "assignee_name",
+    "creator_employee_id",
+    "creator_name",
+    "created_at",
+    "updated_at",
+    "done_at",
+]
+
+JOURNAL_EXPORT_COLUMNS = ["ts", "who", "task_id", "task_title", "body"]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+def iter_task_rows(project_id: int, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    プロジェクトのタスクを担当者名・作成者名つきで1行ずつ返す。
+
+    stream_results で server-side cursor を使い、yield_per 件ずつ取り出すので
+    タスク件数に関係なくメモリ使用量は一定。
+    """
+    assignee = aliased(User)
+    creator = aliased(User)
+
+    stmt = (
+        select(
+            Task.id,
+            Task.title,
+            Task.description,
+            Task.status,
+            Task.priority,
+            Task.due_date,
+            assignee.employee_id,
+            assignee.name,
+            creator.employee_id,
+            creator.name,
+            Task.created_at,
+            Task.updated_at,
+            Task.done_at,
+        )
+        .outerjoin(assignee, assignee.id == Task.assignee_id)
+        .outerjoin(creator, creator.id == Task.created_by)
+        .where(Task.project_id == project_id)
+        .order_by(Task.id.asc())
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+
+    result = db.session.execute(stmt)
+    try:
+        for row in result:
+            yield tuple(row)
+    finally:
+        result.close()
+
+
+def iter_journal_rows(project_id: int):
+    """日誌エントリを古い順に1行ずつ返す（ファイルを行単位で読む）。"""
+    path = journal_path(project_id)
+    if not os.path.exists(path):
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for e in iter_journal_entries(f):
+            yield (e["ts"], e["who"], e["task_id"], e["task_title"], e["body"])
+
+
+def _to_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """csv.writer の書き込み先。書いた文字列をそのまま返す。"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    ヘッダ → 行 の順にCSV文字列を返すジェネレータ。
+    Excel で文字化けしないよう先頭に BOM を付ける。
+    """
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(columns)
+
+    buf = []
+    for row in rows:
+        buf.append(writer.writerow([_to_text(v) for v in row]))
+        if len(buf) >= chunk_rows:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+def stream_jsonl(columns, rows, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """1行1オブジェクトの JSON Lines を返すジェネレータ。"""
+    buf = []
+    for row in rows:
+        obj = {c: _to_json(v) for c, v in zip(columns, row)}
+        buf.append(json.dumps(obj, ensure_ascii=False) + "\n")
+        if len(buf) >= chunk_rows:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+def stream_export(kind: str, fmt: str, project_id: int):
+    """
+    kind（tasks / journal）と fmt（csv / jsonl）に応じたジェネレータを返す。
+    HTTP のストリーミング応答と CLI の両方から使う。
+    """
+    if kind == "tasks":
+        columns, rows = TASK_EXPORT_COLUMNS, iter_task_rows(project_id)
+    elif kind == "journal":
+        columns, rows = JOURNAL_EXPORT_COLUMNS, iter_journal_rows(project_id)
+    else:
+        raise ValueError(f"unknown export kind: {kind}")
+
+    if fmt == "csv":
+        return stream_csv(columns, rows)
+    if fmt == "jsonl":
+        return stream_jsonl(columns, rows)
+    raise ValueError(f"unknown export format: {fmt}")
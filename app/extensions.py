@@ -1,5 +1,21 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
 
-db = SQLAlchemy()
+
+class ShardRoutingSession(Session):
+    """TASK_SHARDING のとき、タスク系のテーブルを含む文をプロジェクト別の SQLite に振り分ける（app/sharding.py）。"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            router = current_app.extensions.get("shard_router")
+            if router is not None:
+                engine = router.engine_for_statement(mapper, clause)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": ShardRoutingSession})
 login_manager = LoginManager()
\ No newline at end of file
@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from markupsafe import Markup
+from . import metrics
+
+metrics.register_counter(
+    "app_fragment_cache_requests_total",
+    "フラグメントキャッシュの参照回数",
+    ("result",),
+)
+
+
+class LRUFragmentCache:
+    """
+    描画済みHTMLを保持するプロセス内キャッシュ。
+
+    合計サイズ（文字数）が max_bytes を超えたら、最も長く使われていないものから捨てる。
+    キーに版番号を含めているので、古い版のエントリは参照されないまま自然に追い出される。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value: str):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "size": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SQLiteFragmentStore:
+    """
+    複数ワーカーで共有するためのキャッシュ置き場（SQLite ファイル）。
+    本体DBとは別ファイルにして、キャッシュの読み書きが本体の書き込みロックと競合しないようにする。
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS fragments ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_fragments_created_at ON fragments (created_at)")
+
+    def _conn(self):
+        # sqlite3 の接続はスレッドをまたいで使えないのでスレッドごとに持つ
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute("SELECT value FROM fragments WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def set(self, key, value: str):
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO fragments (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._writes += 1
+            # 書き込み100回ごとに古いものを削除して件数を抑える
+            if self._writes % 100 == 0:
+                conn.execute(
+                    "DELETE FROM fragments WHERE key IN ("
+                    " SELECT key FROM fragments ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error:
+            # キャッシュなので書けなくても描画結果はそのまま返せばよい
+            pass
+
+
+class FragmentCache:
+    """プロセス内 LRU（L1）と、任意の共有ストア（L2）を組み合わせたキャッシュ。"""
+
+    def __init__(self, local: LRUFragmentCache, shared: SQLiteFragmentStore = None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        metrics.inc("app_fragment_cache_requests_total", ("hit" if value is not None else "miss",))
+        return value
+
+    def set(self, key, value: str):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def stats(self) -> dict:
+        return self.local.stats()
+
+
+def init_fragment_cache(app):
+    local = LRUFragmentCache(app.config["FRAGMENT_CACHE_MAX_BYTES"])
+    shared = None
+    if app.config["FRAGMENT_CACHE_BACKEND"] == "sqlite":
+        shared = SQLiteFragmentStore(
+            app.config["FRAGMENT_CACHE_PATH"],
+            app.config["FRAGMENT_CACHE_SHARED_MAX_ENTRIES"],
+        )
+    app.extensions["fragment_cache"] = FragmentCache(local, shared)
+
+
+def render_fragment(template_name: str, **context) -> str:
+    """
+    部分テンプレートを描画する。context_processor（承認待ち件数の取得など）を
+    通さないよう render_template ではなく jinja_env から直接描画する。
+    """
+    return current_app.jinja_env.get_template(template_name).render(**context)
+
+
+def _cache():
+    if not current_app.config["FRAGMENT_CACHE_ENABLED"]:
+        return None
+    return current_app.extensions["fragment_cache"]
+
+
+def get_fragment(key: str):
+    """キャッシュ済みのHTMLを返す。無ければ None。"""
+    cache = _cache()
+    html = cache.get(key) if cache is not None else None
+    return Markup(html) if html is not None else None
+
+
+def set_fragment(key: str, html: str):
+    """描画したHTMLをキャッシュに入れ、そのまま返す。"""
+    cache = _cache()
+    if cache is not None:
+        cache.set(key, str(html))
+    return Markup(html)
+
+
+def cached_fragment(key: str, render):
+    """key のキャッシュがあればそれを、なければ render() の結果を保存して返す。"""
+    html = get_fragment(key)
+    if html is None:
+        html = set_fragment(key, render())
+    return html
@@ -0,0 +1,187 @@
+import os
+import time
+from flask import abort, current_app, g, session
+from flask_login import current_user, logout_user
+from sqlalchemy import event, select
+from .extensions import db, login_manager
+from .models.project import Project
+from .models.project_member import ProjectMember
+from .models.user import User
+
+# ===== ログインユーザーのスナップショット =====
+#
+# ログイン時にユーザーの主要な属性を（署名付きの）セッションに入れておき、
+# 以降のリクエストでは DB を読まずにそこから current_user を作る。
+# 管理者が権限・有効/停止・承認を変えると users.auth_version が上がり、
+# commit 後に USER_SNAPSHOT_EPOCH_DIR/<user_id> の更新時刻を進める。そのユーザーのそれより前の
+# スナップショットだけが、どのワーカープロセスでも次のリクエストで DB から読み直される
+# （確認は自分のファイルの os.stat 1回で、SQL は増えない。他のユーザーのスナップショットはそのまま）。
+# 管理者画面（require_fresh_user）は念のため毎回 DB の値で確認する。
+
+SNAPSHOT_KEY = "_user_snapshot"
+
+
+class UserSnapshot:
+    """セッションから復元したログインユーザー（読み取り専用。ORM の User ではない）。"""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, data: dict):
+        self.id = data["id"]
+        self.employee_id = data["employee_id"]
+        self.name = data["name"]
+        self.role = data["role"]
+        self.is_active = data["is_active"]
+        self.is_approved = data["is_approved"]
+        self.is_locked = data["is_locked"]
+
+    def get_id(self):
+        return str(self.id)
+
+
+def _can_stay_logged_in(user) -> bool:
+    return bool(user.is_active and user.is_approved and not user.is_locked)
+
+
+def remember_user(user, at: float = None):
+    """
+    ログイン・読み直しのたびにスナップショットを作り直す。
+    at は DB から読んだ時刻（読んだ後に無効化が commit されていたら、次のリクエストで読み直す）。
+    """
+    session[SNAPSHOT_KEY] = {
+        "id": user.id,
+        "employee_id": user.employee_id,
+        "name": user.name,
+        "role": user.role,
+        "is_active": bool(user.is_active),
+        "is_approved": bool(user.is_approved),
+        "is_locked": bool(user.is_locked),
+        "at": time.time() if at is None else at,
+    }
+
+
+def forget_user():
+    session.pop(SNAPSHOT_KEY, None)
+
+
+def _epoch_path(user_id: int) -> str:
+    return os.path.join(current_app.config["USER_SNAPSHOT_EPOCH_DIR"], str(user_id))
+
+
+def _epoch(user_id: int) -> float:
+    """そのユーザーのスナップショットが最後に無効化された時刻（全プロセス共通）。"""
+    try:
+        return os.stat(_epoch_path(user_id)).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _bump_epoch(user_id: int):
+    path = _epoch_path(user_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a"):
+        pass
+    os.utime(path)
+
+
+def _is_fresh(data: dict, user_id: int) -> bool:
+    ttl = current_app.config["USER_SNAPSHOT_TTL"]
+    if ttl <= 0 or data.get("id") != user_id:
+        return False
+    at = data.get("at", 0)
+    if time.time() - at >= ttl:
+        return False
+    return at > _epoch(user_id)
+
+
+def load_user(user_id: str):
+    """
+    login_manager.user_loader 本体。
+    スナップショットが新しければそれを返し、古ければ DB から読み直して作り直す。
+    停止・ロック・承認取り消しになっていたらログアウト扱い（None）にする。
+    """
+    user_id = int(user_id)
+    data = session.get(SNAPSHOT_KEY)
+    if data and _is_fresh(data, user_id):
+        return UserSnapshot(data)
+
+    read_at = time.time()
+    user = db.session.get(User, user_id)
+    if user is None or not _can_stay_logged_in(user):
+        forget_user()
+        return None
+    remember_user(user, at=read_at)
+    return user
+
+
+def require_fresh_user():
+    """
+    管理者画面など権限の強い操作の前に呼ぶ。スナップショットではなく DB の値で current_user を確かめ、
+    停止・ロック・承認取り消しになっていればログアウトさせてログイン画面へ送る。DB から読んだ User を返す。
+    """
+    if not current_user.is_authenticated:
+        abort(login_manager.unauthorized())
+    if isinstance(current_user._get_current_object(), User):
+        return current_user._get_current_object()
+
+    user = db.session.get(User, current_user.id)
+    if user is None or not _can_stay_logged_in(user):
+        forget_user()
+        logout_user()
+        abort(login_manager.unauthorized())
+    remember_user(user)
+    return user
+
+
+def invalidate_user(user):
+    """
+    権限・有効/停止・ロック・承認を変えたときに呼ぶ。auth_version を上げ、
+    commit されたら全プロセスのそのユーザーのそれ以前のスナップショットを無効にする。
+    """
+    user.auth_version = (user.auth_version or 0) + 1
+    db.session.info.setdefault("invalidated_users", set()).add(user.id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _publish_invalidated_users(session_):
+    for user_id in session_.info.pop("invalidated_users", ()):
+        _bump_epoch(user_id)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_invalidated_users(session_):
+    session_.info.pop("invalidated_users", None)
+
+
+# ===== リクエスト内のプロジェクト・所属キャッシュ =====
+
+def project_access(project_id: int):
+    """
+    (Project, 自分の ProjectMember) を1回のクエリで読み、リクエストの間は使い回す。
+    権限チェック（can_access_project など）とビューでのプロジェクト取得が同じ結果を共有する。
+    プロジェクトが無ければ (None, None)、メンバーでなければ (Project, None)。
+    """
+    cache = g.setdefault("_project_access", {})
+    if project_id not in cache:
+        row = db.session.execute(
+            select(Project, ProjectMember)
+            .outerjoin(
+                ProjectMember,
+                (ProjectMember.project_id == Project.id) & (ProjectMember.user_id == current_user.id),
+            )
+            .where(Project.id == project_id)
+        ).first()
+        cache[project_id] = (row[0], row[1]) if row else (None, None)
+    return cache[project_id]
+
+
+def get_project_or_404(project_id: int):
+    project = project_access(project_id)[0]
+    if project is None:
+        abort(404)
+    return project
+
+
+def my_membership(project_id: int):
+    return project_access(project_id)[1]
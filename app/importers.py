@@ -0,0 +1,216 @@
+import csv
+from datetime import date, datetime
+from sqlalchemy import select
+from .extensions import db
+from .models.project import Project
+from .models.project_member import ProjectMember
+from .models.task import Task
+from .models.task_status_event import TaskStatusEvent
+from .models.user import User
+from .ranking import rank_after
+
+# 何行ごとに検証・担当者解決・INSERT を行うか
+IMPORT_CHUNK_SIZE = 500
+
+# 画面に返すエラーの上限（件数そのものは error_count で数える）
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+IMPORT_COLUMNS = ["title", "description", "priority", "due_date", "assignee_employee_id"]
+
+ALLOWED_PRIORITIES = {Task.PRIORITY_LOW, Task.PRIORITY_MID, Task.PRIORITY_HIGH}
+
+
+class ImportAborted(Exception):
+    """取り込みを中止した（全件ロールバックする）ときに投げる。result に行ごとのエラーが入っている。"""
+
+    def __init__(self, result):
+        super().__init__(f"import aborted ({result.error_count} errors)")
+        self.result = result
+
+
+class ImportResult:
+    """一括取り込みの結果（取り込み件数と行ごとのエラー）。"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []  # [(行番号, メッセージ), ...]
+        self.rolled_back = False
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+
+def _validate_row(raw: dict):
+    """
+    1行ぶんを検証し、(値の dict, 担当者の社員番号, エラーメッセージ) を返す。
+    担当者の存在確認はチャンク単位でまとめて行うのでここではしない。
+    """
+    title = (raw.get("title") or "").strip()
+    description = (raw.get("description") or "").strip()
+    priority = (raw.get("priority") or "").strip() or Task.PRIORITY_MID
+    due_date_str = (raw.get("due_date") or "").strip()
+    assignee_raw = (raw.get("assignee_employee_id") or "").strip()
+
+    if not title:
+        return None, None, "タイトルは必須です"
+    if len(title) > 200:
+        return None, None, "タイトルは200文字以内で入力してください"
+    if priority not in ALLOWED_PRIORITIES:
+        return None, None, f"優先度が不正です（{priority}）"
+
+    # 画面からの作成（create_task）と同じく、期限は必須で今日以降
+    if not due_date_str:
+        return None, None, "期限は必須です"
+    try:
+        due_date = datetime.strptime(due_date_str, "%Y-%m-%d").date()
+    except ValueError:
+        return None, None, f"期限の形式が不正です（{due_date_str}）"
+    if due_date < date.today():
+        return None, None, f"期限は今日以降を指定してください（{due_date_str}）"
+
+    assignee_employee_id = None
+    if assignee_raw:
+        if not assignee_raw.isdigit():
+            return None, None, f"担当者の社員番号は数字で入力してください（{assignee_raw}）"
+        assignee_employee_id = int(assignee_raw)
+
+    values = {
+        "title": title,
+        "description": description,
+        "priority": priority,
+        "due_date": due_date,
+    }
+    return values, assignee_employee_id, None
+
+
+def _resolve_assignees(project_id: int, employee_ids):
+    """
+    社員番号 → (user_id, プロジェクトメンバーかどうか) を1回の IN クエリで引く。
+    """
+    if not employee_ids:
+        return {}
+
+    rows = db.session.execute(
+        select(User.employee_id, User.id, ProjectMember.id)
+        .outerjoin(
+            ProjectMember,
+            (ProjectMember.user_id == User.id) & (ProjectMember.project_id == project_id),
+        )
+        .where(User.employee_id.in_(employee_ids))
+    ).all()
+    return {emp_id: (user_id, pm_id is not None) for emp_id, user_id, pm_id in rows}
+
+
+def _import_chunk(chunk, project_id: int, created_by: int, result: ImportResult):
+    parsed = []
+    for line_no, raw in chunk:
+        values, assignee_employee_id, error = _validate_row(raw)
+        if error:
+            result.add_error(line_no, error)
+        else:
+            parsed.append((line_no, values, assignee_employee_id))
+
+    assignees = _resolve_assignees(
+        project_id,
+        {emp_id for _, _, emp_id in parsed if emp_id is not None},
+    )
+
+    rows = []
+    # 取り込んだタスクは todo 列の末尾に順に並べる
+    rank = None
+    for line_no, values, assignee_employee_id in parsed:
+        assignee_id = None
+        if assignee_employee_id is not None:
+            found = assignees.get(assignee_employee_id)
+            if found is None:
+                result.add_error(line_no, f"担当者が見つかりません（社員番号 {assignee_employee_id}）")
+                continue
+            if not found[1]:
+                result.add_error(line_no, f"担当者がプロジェクトメンバーではありません（社員番号 {assignee_employee_id}）")
+                continue
+            assignee_id = found[0]
+
+        rank = rank_after(rank) if rank is not None else Task.rank_at_end(project_id, Task.STATUS_TODO)
+        values.update(
+            project_id=project_id,
+            assignee_id=assignee_id,
+            created_by=created_by,
+            rank=rank,
+        )
+        rows.append(values)
+
+    if rows:
+        # Core の executemany でまとめて INSERT（ORM オブジェクトは作らない）
+        task_ids = db.session.execute(
+            Task.__table__.insert().returning(Task.__table__.c.id), rows
+        ).scalars().all()
+
+        # 作成履歴（None → todo）も同じトランザクションでまとめて入れる
+        now = datetime.utcnow()
+        db.session.execute(
+            TaskStatusEvent.__table__.insert(),
+            [
+                {
+                    "task_id": task_id,
+                    "project_id": project_id,
+                    "from_status": None,
+                    "to_status": Task.STATUS_TODO,
+                    "changed_by": created_by,
+                    "created_at": now,
+                }
+                for task_id in task_ids
+            ],
+        )
+        result.inserted += len(rows)
+
+
+def import_tasks_csv(stream, project_id: int, created_by: int, all_or_nothing: bool = False,
+                     chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportResult:
+    """
+    CSV（title, description, priority, due_date, assignee_employee_id）から
+    タスクを一括登録する。
+
+    ファイルは chunk_size 行ずつ読み進めるので、大きなファイルでもメモリ使用量は一定。
+    ここでは commit しない。run_in_transaction（transactional）の中で呼び、全チャンクを
+    1トランザクションで commit する（ロック待ちでやり直しても二重に登録されない）。
+    CSV が読めないとき、all_or_nothing=True で1行でもエラーがあったときは ImportAborted を投げる
+    （トランザクションごとロールバックされる）。
+    """
+    result = ImportResult()
+    reader = csv.DictReader(stream)
+
+    fieldnames = [(c or "").strip() for c in (reader.fieldnames or [])]
+    if "title" not in fieldnames:
+        result.add_error(1, "ヘッダ行に title 列がありません")
+        return result
+    reader.fieldnames = fieldnames
+
+    try:
+        chunk = []
+        line_no = reader.line_num
+        for raw in reader:
+            # 改行を含むセルがあっても、その行の開始行番号を報告する
+            chunk.append((line_no + 1, raw))
+            line_no = reader.line_num
+            if len(chunk) >= chunk_size:
+                _import_chunk(chunk, project_id, created_by, result)
+                chunk = []
+        if chunk:
+            _import_chunk(chunk, project_id, created_by, result)
+    except (UnicodeDecodeError, csv.Error) as e:
+        result.add_error(reader.line_num, f"CSVを読み込めません：{e.__class__.__name__}")
+        result.inserted = 0
+        result.rolled_back = True
+        raise ImportAborted(result) from e
+
+    if all_or_nothing and result.error_count:
+        result.inserted = 0
+        result.rolled_back = True
+        raise ImportAborted(result)
+
+    if result.inserted:
+        Project.bump_cache_version(project_id)
+    return result
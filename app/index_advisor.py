@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from sqlalchemy import func, select
+from .dashboard import summary_statement
+from .extensions import db
+from .models.project import Project
+from .models.project_member import ProjectMember
+from .models.task import Task
+from .models.user import User
+
+
+def app_query_shapes():
+    """
+    画面・権限チェックで実際に発行しているクエリの形を (名前, SELECT文) で返す。
+    パラメータは代表値（id=1 など）を入れている。
+    """
+    return [
+        ("auth.login", select(User).where(User.employee_id == 1001)),
+        ("admin.list_users", select(User).order_by(User.id.asc())),
+        ("pending_count", select(func.count()).select_from(User).where(User.is_approved.is_(False))),
+        ("can_access_project", select(ProjectMember).where(
+            ProjectMember.project_id == 1, ProjectMember.user_id == 1)),
+        ("list_projects", select(Project)
+            .join(ProjectMember, Project.id == ProjectMember.project_id)
+            .where(ProjectMember.user_id == 1)),
+        ("list_projects.stats", select(Task.project_id, Task.status, func.count(Task.id))
+            .where(Task.project_id.in_([1, 2, 3]))
+            .group_by(Task.project_id, Task.status)),
+        ("dashboard.summary", summary_statement(1, date(2026, 1, 1), datetime(2026, 1, 1))),
+        ("project_members", select(ProjectMember).where(ProjectMember.project_id == 1)),
+        ("list_tasks", select(Task).where(Task.project_id == 1, Task.status == "todo").order_by(Task.rank)),
+        ("task.rank_at_end", select(func.max(Task.rank)).where(Task.project_id == 1, Task.status == "todo")),
+        ("move_task.neighbors", select(Task).where(
+            Task.project_id == 1, Task.status == "todo", Task.rank < "V").order_by(Task.rank.desc()).limit(2)),
+        ("journal.tasks", select(Task.id, Task.title).where(Task.project_id == 1).order_by(Task.id.desc())),
+        ("change_task_status", select(Task).where(Task.id == 1, Task.project_id == 1)),
+    ]
+
+
+def explain(conn, sql: str):
+    """EXPLAIN QUERY PLAN の detail 列を返す。"""
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def plan_problems(plan):
+    """全件スキャン・一時B-treeによるソートを拾う。"""
+    problems = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and " USING " not in detail:
+            problems.append(f"全件スキャン：{detail}")
+        elif "USE TEMP B-TREE" in detail:
+            problems.append(f"一時B-treeでソート：{detail}")
+    return problems
+
+
+def advise():
+    """
+    各クエリの実行計画を調べ、(名前, SQL, 実行計画, 問題点) のリストを返す。
+    app context 内で呼ぶこと。
+    """
+    engine = db.engine
+    report = []
+    with engine.connect() as conn:
+        for name, stmt in app_query_shapes():
+            sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            plan = explain(conn, sql)
+            report.append((name, sql, plan, plan_problems(plan)))
+    return report
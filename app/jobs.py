@@ -0,0 +1,333 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import bindparam, text
+from . import metrics
+from .extensions import db
+from .models.job import Job
+from .sharding import use_shard
+
+logger = logging.getLogger("app.jobs")
+
+metrics.register_counter("app_jobs_total", "バックグラウンドジョブの実行回数", ("kind", "result"))
+metrics.register_histogram("app_job_duration_seconds", "バックグラウンドジョブの処理時間（秒）", ("kind",))
+
+# kind → 処理関数（job を受け取り、JSON にできる結果を返す）
+HANDLERS = {}
+
+
+def job_handler(kind: str):
+    """ジョブの処理関数を登録するデコレータ。"""
+
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def enqueue(kind: str, payload: dict = None, created_by: int = None, max_attempts: int = None,
+            commit: bool = True) -> Job:
+    """
+    ジョブを1件キューに入れる。
+    commit=False なら呼び出し側のトランザクション（transactional など）と一緒に commit される。
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"unknown job kind: {kind}")
+
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}, ensure_ascii=False),
+        created_by=created_by,
+        run_at=datetime.utcnow(),
+    )
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    return job
+
+
+def has_workers() -> bool:
+    """
+    ジョブを処理するワーカーがいるか（このプロセスのスレッド、または JOBS_EXTERNAL_WORKER の flask worker）。
+    いなければ、登録しても実行されないので呼び出し側がその場で処理する。
+    """
+    config = current_app.config
+    return config["JOBS_WORKERS"] > 0 or config["JOBS_EXTERNAL_WORKER"]
+
+
+def enqueue_once(kind: str, payload: dict = None, **kwargs):
+    """同じ kind・payload のジョブが待ち or 実行中でなければ登録する。登録したら Job を返す。"""
+    pending = Job.query.filter(
+        Job.kind == kind,
+        Job.payload == json.dumps(payload or {}, ensure_ascii=False),
+        Job.status.in_([Job.STATUS_QUEUED, Job.STATUS_RUNNING]),
+    ).first()
+    if pending is not None:
+        return None
+    return enqueue(kind, payload, **kwargs)
+
+
+# ===== 取り出しと実行 =====
+
+# 実行可能な先頭の1件を、1つの UPDATE で running にする。
+# 複数のワーカー（別プロセスでも）が同時に呼んでも、同じ行を取れるのは1つだけ
+CLAIM_SQL = text(
+    "UPDATE jobs SET status = 'running', locked_by = :worker, locked_at = :now, attempts = attempts + 1 "
+    "WHERE id = ("
+    " SELECT id FROM jobs WHERE status = 'queued' AND run_at <= :now ORDER BY run_at, id LIMIT 1"
+    ") AND status = 'queued' "
+    "RETURNING id"
+)
+
+
+def claim_next(worker_id: str):
+    """次のジョブを確保して id を返す。無ければ None。"""
+    job_id = db.session.execute(CLAIM_SQL, {"worker": worker_id, "now": datetime.utcnow()}).scalar()
+    db.session.commit()
+    return job_id
+
+
+def requeue_stale(lock_timeout: float) -> int:
+    """
+    running のまま lock_timeout 秒以上経ったジョブ（ワーカーが落ちたもの）を戻す。
+    試行回数が残っていれば queued に、使い切っていれば failed にする。
+    """
+    now = datetime.utcnow()
+    params = {"stale": now - timedelta(seconds=lock_timeout), "now": now}
+    requeued = db.session.execute(text(
+        "UPDATE jobs SET status = 'queued', locked_by = NULL, locked_at = NULL, run_at = :now "
+        "WHERE status = 'running' AND locked_at < :stale AND attempts < max_attempts"
+    ), params).rowcount
+    db.session.execute(text(
+        "UPDATE jobs SET status = 'failed', finished_at = :now, error = 'ワーカーが応答しなくなりました' "
+        "WHERE status = 'running' AND locked_at < :stale AND attempts >= max_attempts"
+    ), params)
+    db.session.commit()
+    return requeued
+
+
+def retry_delay(attempts: int, base: float, cap: float) -> float:
+    """指数バックオフ（base, 2*base, 4*base, ... を cap で頭打ち）に少しゆらぎを足す。"""
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay + random.uniform(0, delay * 0.1)
+
+
+def run_job(app, job_id: int):
+    """確保済みのジョブを1件実行し、結果（成功 / 再試行待ち / 失敗）を書き込む。"""
+    job = db.session.get(Job, job_id)
+    handler = HANDLERS.get(job.kind)
+    kind = job.kind
+    started = time.perf_counter()
+
+    try:
+        if handler is None:
+            raise LookupError(f"unknown job kind: {kind}")
+        with use_shard(job.payload_data.get("project_id")):
+            result = handler(job)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.error = f"{e.__class__.__name__}: {e}"
+        job.locked_by = None
+        job.locked_at = None
+        if job.attempts < job.max_attempts and handler is not None:
+            delay = retry_delay(job.attempts, app.config["JOBS_RETRY_BASE_SECONDS"], app.config["JOBS_RETRY_MAX_SECONDS"])
+            job.status = Job.STATUS_QUEUED
+            job.run_at = datetime.utcnow() + timedelta(seconds=delay)
+            outcome = "retry"
+        else:
+            job.status = Job.STATUS_FAILED
+            job.finished_at = datetime.utcnow()
+            outcome = "failed"
+        logger.warning(
+            "job %s (%s) %s: attempt %s/%s\n%s",
+            job_id, kind, outcome, job.attempts, job.max_attempts, traceback.format_exc(),
+        )
+    else:
+        job.status = Job.STATUS_SUCCEEDED
+        job.result = json.dumps(result, ensure_ascii=False) if result is not None else None
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        outcome = "succeeded"
+
+    db.session.commit()
+    metrics.inc("app_jobs_total", (kind, outcome))
+    metrics.observe("app_job_duration_seconds", time.perf_counter() - started, (kind,))
+    # flask worker（別プロセス）の集計も /metrics に出るようにファイルへ書き出す
+    store = app.extensions.get("metrics_store")
+    if store is not None:
+        store.maybe_flush()
+    return outcome
+
+
+def run_pending(app, worker_id: str = None) -> int:
+    """
+    今実行できるジョブをキューが空になるまで処理する。処理した件数を返す。
+    app context 内で呼ぶこと（flask worker --burst など）。
+    """
+    worker_id = worker_id or _worker_name(0)
+    requeue_stale(app.config["JOBS_LOCK_TIMEOUT"])
+    count = 0
+    while True:
+        job_id = claim_next(worker_id)
+        if job_id is None:
+            return count
+        run_job(app, job_id)
+        db.session.remove()
+        count += 1
+
+
+# ===== ワーカー =====
+
+def _worker_name(index: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+class JobWorker(threading.Thread):
+    """キューを見張ってジョブを1件ずつ実行するスレッド。"""
+
+    def __init__(self, app, index: int):
+        super().__init__(name=f"job-worker-{index}", daemon=True)
+        self.app = app
+        self.worker_id = _worker_name(index)
+        self.poll_interval = app.config["JOBS_POLL_INTERVAL"]
+        self.lock_timeout = app.config["JOBS_LOCK_TIMEOUT"]
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        next_stale_check = 0.0
+        while not self._stop_event.is_set():
+            job_id = None
+            with self.app.app_context():
+                try:
+                    if time.monotonic() >= next_stale_check:
+                        requeue_stale(self.lock_timeout)
+                        next_stale_check = time.monotonic() + self.lock_timeout / 2
+                    job_id = claim_next(self.worker_id)
+                    if job_id is not None:
+                        run_job(self.app, job_id)
+                except Exception:
+                    # DB のロック待ちなどで取り出しに失敗しても、ワーカーは止めない
+                    db.session.rollback()
+                    logger.exception("job worker %s error", self.worker_id)
+                finally:
+                    db.session.remove()
+            if job_id is None:
+                self._stop_event.wait(self.poll_interval)
+
+
+def start_workers(app, count: int):
+    workers = [JobWorker(app, i) for i in range(count)]
+    for w in workers:
+        w.start()
+    return workers
+
+
+def init_jobs(app):
+    """
+    JOBS_WORKERS > 0 なら、このプロセスの中でワーカースレッドを動かす。
+    起動は最初のリクエスト時に行う（CLI コマンドや、gunicorn --preload の fork 前には動かさない）。
+    """
+    count = app.config["JOBS_WORKERS"]
+    if count <= 0:
+        return
+
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_job_workers():
+        if "job_workers" in app.extensions:
+            return
+        with lock:
+            if "job_workers" not in app.extensions:
+                app.extensions["job_workers"] = start_workers(app, count)
+
+
+# ===== ジョブの中身 =====
+
+def export_path(app, job_id: int, fmt: str) -> str:
+    directory = app.config["JOBS_EXPORT_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"job_{job_id}.{fmt}")
+
+
+@job_handler("export")
+def _export(job):
+    """タスク / 日誌のエクスポートをファイルに書き出す（ダウンロードは /jobs/<id>/download）。"""
+    from flask import current_app
+    from .exporters import stream_export
+
+    payload = job.payload_data
+    kind, fmt, project_id = payload["kind"], payload["format"], payload["project_id"]
+
+    path = export_path(current_app, job.id, fmt)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        for chunk in stream_export(kind, fmt, project_id):
+            f.write(chunk)
+    os.replace(tmp, path)
+
+    return {
+        "filename": f"project_{project_id}_{kind}.{fmt}",
+        "size": os.path.getsize(path),
+    }
+
+
+def rebalance_ranks(project_id: int, status: str) -> int:
+    """
+    カンバン1列ぶんの順位を等間隔に振り直す（移動を繰り返して順位文字列が長くなったとき）。
+    version も上げるので、振り直しの最中に同じカードを動かした人には 409 が返る。
+    コミットは呼び出し側（ジョブ、またはワーカーがいないときの move_task）。振り直した件数を返す。
+    """
+    from .models.project import Project
+    from .models.task import Task
+    from .ranking import initial_ranks
+
+    ids = db.session.execute(
+        db.select(Task.id)
+        .where(Task.project_id == project_id, Task.status == status)
+        .order_by(Task.rank, Task.id)
+    ).scalars().all()
+
+    if ids:
+        # text() だと ShardRoutingSession が tasks を見つけられずメイン DB に流れるので、テーブルを指定して書く
+        tasks = Task.__table__
+        db.session.execute(
+            db.update(tasks)
+            .where(tasks.c.id == bindparam("task_id"))
+            .values(rank=bindparam("new_rank"), version=tasks.c.version + 1),
+            [{"new_rank": r, "task_id": task_id} for task_id, r in zip(ids, initial_ranks(len(ids)))],
+        )
+    Project.bump_cache_version(project_id)
+    return len(ids)
+
+
+@job_handler("rebalance_ranks")
+def _rebalance_ranks(job):
+    payload = job.payload_data
+    count = rebalance_ranks(payload["project_id"], payload["status"])
+    db.session.commit()
+    return {"tasks": count}
+
+
+@job_handler("build_snapshots")
+def _build_snapshots(job):
+    """分析用の日次スナップショットを作り足す。"""
+    from .analytics import build_snapshots
+
+    return {"days": build_snapshots(job.payload_data["project_id"])}
@@ -0,0 +1,67 @@
+import os
+import re
+from flask import current_app
+
+# ヘッダ行の例:
+# [2026-02-16 14:57] 山田太郎（ID:1001） | task:12:資料作成
+HEADER_RE = re.compile(
+    r'^\[(?P<ts>[\d\-:\s]+)\]\s*(?P<who>.+?)(?:\s*\|\s*task:(?P<task_id>\d+):(?P<task_title>.*))?$'
+)
+
+
+def journal_path(project_id: int) -> str:
+    """
+    プロジェクトごとの日誌ファイルのパスを返す。
+    保存先フォルダ：instance/journals/
+    """
+    journal_dir = os.path.join(current_app.instance_path, "journals")
+    os.makedirs(journal_dir, exist_ok=True)
+    return os.path.join(journal_dir, f"project_{project_id}.txt")
+
+
+def iter_journal_entries(lines):
+    """
+    行のイテラブルから日誌エントリを1件ずつ返すジェネレータ。
+
+    ファイルオブジェクトをそのまま渡せるので、日誌全体をメモリに載せずに
+    先頭（古い順）から読み進められる。
+    """
+    current = None
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+        m = HEADER_RE.match(line.strip())
+        if m:
+            if current:
+                current["body"] = "\n".join(current["body"]).strip()
+                yield current
+            current = {
+                "ts": m.group("ts").strip(),
+                "who": (m.group("who") or "").strip(),
+                "task_id": int(m.group("task_id")) if m.group("task_id") else None,
+                "task_title": (m.group("task_title") or "").strip() if m.group("task_title") else "",
+                "body": []
+            }
+        else:
+            if current is not None:
+                current["body"].append(line)
+
+    if current:
+        current["body"] = "\n".join(current["body"]).strip()
+        yield current
+
+
+def parse_journal_entries(text: str):
+    """
+    フォーマット例:
+    [2026-02-16 14:57] 山田太郎（ID:1001）
+    本文...
+
+    新しい順のリストを返す。
+    """
+    if not text:
+        return []
+
+    entries = list(iter_journal_entries(text.splitlines()))
+    entries.reverse()
+    return entries
@@ -0,0 +1,400 @@
+import glob
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from flask import Response, abort, g, has_request_context, request
+from flask import before_render_template, template_rendered
+from flask_login import current_user
+from .extensions import login_manager
+from .sharding import listen_engines
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RENDER_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# name → (種類, 説明, ラベル名, バケット)
+_families = {}
+
+
+def register_counter(name: str, help_text: str, labels=()):
+    _families[name] = ("counter", help_text, tuple(labels), None)
+
+
+def register_histogram(name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+    _families[name] = ("histogram", help_text, tuple(labels), tuple(buckets))
+
+
+register_counter("app_requests_total", "HTTPリクエスト数", ("endpoint", "method", "status"))
+register_histogram("app_request_duration_seconds", "リクエスト処理時間（秒）", ("endpoint",))
+register_counter("app_db_queries_total", "リクエスト中に実行したSQL数", ("endpoint",))
+register_histogram("app_template_render_seconds", "テンプレート描画時間（秒）", ("template",), RENDER_BUCKETS)
+
+
+class _ThreadStats:
+    """
+    1スレッド分の集計。書き込むのは持ち主のスレッドだけなのでロック不要。
+    """
+
+    __slots__ = ("thread", "counters", "histograms")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}  # (name, labels) → 値
+        self.histograms = {}  # (name, labels) → [各バケット..., +Inf, 合計]
+
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_thread_stats = []
+_retired = _ThreadStats(None)  # 終了したスレッドの集計を寄せておく
+
+
+def _stats() -> _ThreadStats:
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        stats = _ThreadStats(threading.current_thread())
+        _local.stats = stats
+        with _registry_lock:
+            _thread_stats.append(stats)
+    return stats
+
+
+def inc(name: str, labels=(), value=1):
+    """カウンタを加算する。"""
+    counters = _stats().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, labels=()):
+    """ヒストグラムに1件記録する。"""
+    buckets = _families[name][3]
+    histograms = _stats().histograms
+    key = (name, labels)
+    h = histograms.get(key)
+    if h is None:
+        h = [0] * (len(buckets) + 2)
+        histograms[key] = h
+
+    i = 0
+    for bound in buckets:
+        if value <= bound:
+            break
+        i += 1
+    h[i] += 1
+    h[-1] += value
+
+
+def _copy(d):
+    # 他スレッドが書き込み中でも落ちないよう、数回だけやり直す
+    for _ in range(5):
+        try:
+            return [(k, list(v) if isinstance(v, list) else v) for k, v in list(d.items())]
+        except RuntimeError:
+            continue
+    return []
+
+
+def _merge_into(counters, histograms, counter_items, histogram_items):
+    for key, value in counter_items:
+        counters[key] = counters.get(key, 0) + value
+    for key, h in histogram_items:
+        acc = histograms.get(key)
+        if acc is None:
+            histograms[key] = list(h)
+        else:
+            for i, v in enumerate(h):
+                acc[i] += v
+
+
+def collect_local():
+    """このプロセス内の全スレッドの集計を合算する。"""
+    counters, histograms = {}, {}
+    with _registry_lock:
+        alive = []
+        for stats in _thread_stats:
+            if stats.thread.is_alive():
+                alive.append(stats)
+            else:
+                _merge_into(_retired.counters, _retired.histograms,
+                            stats.counters.items(), stats.histograms.items())
+        _thread_stats[:] = alive
+        sources = [_retired] + alive
+
+    for stats in sources:
+        _merge_into(counters, histograms, _copy(stats.counters), _copy(stats.histograms))
+    return counters, histograms
+
+
+# METRICS_DIR のファイル名
+#   metrics_<pid>.json         … 動いているワーカーの集計（pid のプロセスが無くなったら dead に足し込む）
+#   metrics_orphan_<...>.json  … 同じ pid が再利用されたときに前のプロセスが残した集計
+#   metrics_dead.json          … 止まったワーカーの合計（カウンタが減らないように残す）
+_PID_FILE = re.compile(r"metrics_(\d+)\.json$")
+_ORPHAN_PREFIX = "metrics_orphan_"
+_DEAD_NAME = "metrics_dead.json"
+_LOCK_NAME = "metrics.lock"
+# 持ち主が落ちて残ったロックファイルを捨てるまでの秒数
+_STALE_LOCK_SECONDS = 60
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # Windows の os.kill(pid, 0) は CTRL_C_EVENT を送ってしまうので確かめない（消さない）
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_file(path: str):
+    """集計ファイルを (counter_items, histogram_items) で読む。読めなければ空。"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return [], []
+    return (
+        [((name, tuple(labels)), v) for name, labels, v in data.get("counters", [])],
+        [((name, tuple(labels)), v) for name, labels, v in data.get("histograms", [])],
+    )
+
+
+def _write_file(path: str, counters, histograms):
+    data = {
+        "counters": [[k[0], list(k[1]), v] for k, v in counters.items()],
+        "histograms": [[k[0], list(k[1]), v] for k, v in histograms.items()],
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class _FileStore:
+    """
+    複数ワーカープロセスの集計を共有するためのファイルストア。
+
+    各プロセスは自分の集計を METRICS_DIR/metrics_<pid>.json に定期的に書き出し、
+    /metrics を受けたプロセスが全ファイルを合算する。
+    止まったプロセスのファイルは metrics_dead.json に足し込んでから消す
+    （prometheus_client の mark_process_dead と同じ考え方。再起動してもカウンタは減らない）。
+    """
+
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self.last_flush = 0.0
+        self.lock = threading.Lock()
+        self._pid = None  # このストアが最後に書き出した pid（fork 後は変わる）
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush < self.interval:
+            return
+        # 他のスレッドが書き出し中ならそちらに任せる
+        if self.lock.acquire(blocking=False):
+            try:
+                self._write()
+            finally:
+                self.lock.release()
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        self.last_flush = time.monotonic()
+        counters, histograms = collect_local()
+        os.makedirs(self.directory, exist_ok=True)
+        # pid は fork 後に変わるので毎回求める
+        pid = os.getpid()
+        path = os.path.join(self.directory, f"metrics_{pid}.json")
+        if self._pid != pid:
+            self._pid = pid
+            # 同じ pid の前のプロセスが残したファイルは上書きせず、止まったプロセスの分として残す
+            try:
+                os.replace(path, os.path.join(self.directory, f"{_ORPHAN_PREFIX}{pid}_{time.time_ns()}.json"))
+            except FileNotFoundError:
+                pass
+            self.prune()
+        _write_file(path, counters, histograms)
+
+    def prune(self):
+        """
+        止まったプロセスのファイルを metrics_dead.json に足し込んで消す。
+        複数のプロセスが同時に足し込まないよう、ロックファイル（O_EXCL で作成）を取れたときだけ行う。
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        lock_path = os.path.join(self.directory, _LOCK_NAME)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > _STALE_LOCK_SECONDS:
+                    os.remove(lock_path)
+            except OSError:
+                pass
+            return
+        try:
+            os.close(fd)
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+                name = os.path.basename(path)
+                m = _PID_FILE.match(name)
+                if name.startswith(_ORPHAN_PREFIX) or (m is not None and not _pid_alive(int(m.group(1)))):
+                    dead.append(path)
+            if not dead:
+                return
+
+            dead_path = os.path.join(self.directory, _DEAD_NAME)
+            counters, histograms = {}, {}
+            for path in [dead_path] + dead:
+                _merge_into(counters, histograms, *_read_file(path))
+            _write_file(dead_path, counters, histograms)
+            for path in dead:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            os.remove(lock_path)
+
+    def collect_all(self):
+        self.flush()
+        self.prune()
+        counters, histograms = {}, {}
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            _merge_into(counters, histograms, *_read_file(path))
+        return counters, histograms
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_prometheus(counters, histograms) -> str:
+    """Prometheus のテキスト形式（version 0.0.4）に整形する。"""
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in sorted(_families.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        if kind == "counter":
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_format_labels(label_names, labels)} {value}")
+            continue
+
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, h):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_format_labels(label_names, labels, le)} {cumulative}")
+            cumulative += h[len(buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_format_labels(label_names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(label_names, labels)} {h[-1]}")
+            lines.append(f"{name}_count{_format_labels(label_names, labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._metrics_queries = g.get("_metrics_queries", 0) + 1
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault("_metrics_render", []).append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    if not has_request_context():
+        return
+    starts = g.get("_metrics_render")
+    if starts:
+        observe("app_template_render_seconds", time.perf_counter() - starts.pop(), (template.name or "",))
+
+
+def init_metrics(app):
+    """
+    エンドポイントごとのリクエスト数・ステータス・処理時間・SQL数・
+    テンプレート描画時間を集計し、/metrics で Prometheus 形式に出す。
+    """
+    if not app.config.get("METRICS_ENABLED"):
+        return
+
+    store = _FileStore(app.config["METRICS_DIR"], app.config["METRICS_FLUSH_INTERVAL"])
+    store.prune()  # 前回までに止まったワーカーのファイルを片付ける
+    app.extensions["metrics_store"] = store
+
+    listen_engines(app, "after_cursor_execute", _after_cursor_execute)
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return response
+
+        endpoint = request.endpoint or "none"
+        inc("app_requests_total", (endpoint, request.method, str(response.status_code)))
+        observe("app_request_duration_seconds", time.perf_counter() - start, (endpoint,))
+        queries = g.pop("_metrics_queries", 0)
+        if queries:
+            inc("app_db_queries_total", (endpoint,), queries)
+        if response.is_streamed:
+            # 本文を送りながら実行したクエリは、送り終えて閉じるときに足す
+            request_g = g._get_current_object()
+
+            def count_streamed_queries():
+                streamed = request_g.pop("_metrics_queries", 0)
+                if streamed:
+                    inc("app_db_queries_total", (endpoint,), streamed)
+
+            response.call_on_close(count_streamed_queries)
+
+        store.maybe_flush()
+        return response
+
+    @app.get("/metrics")
+    def metrics():
+        token = app.config.get("METRICS_TOKEN")
+        auth = request.headers.get("Authorization", "")
+        if token and hmac.compare_digest(auth, f"Bearer {token}"):
+            pass
+        elif not current_user.is_authenticated:
+            return login_manager.unauthorized()
+        elif current_user.role != "admin":
+            abort(403)
+
+        counters, histograms = store.collect_all()
+        return Response(
+            render_prometheus(counters, histograms),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
@@ -0,0 +1,289 @@
+import glob
+import os
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import create_engine, text
+from .extensions import db
+
+# バックフィル1回あたりの更新行数と、バッチ間で書き込みロックを手放す時間
+BACKFILL_BATCH_SIZE = 1000
+BACKFILL_PAUSE = 0.01
+
+# (version, 説明, 関数) のリスト。version の昇順に適用する
+MIGRATIONS = []
+# タスク系のテーブル（シャードにもあるもの）を変える version。シャードのファイルにも適用する
+SHARD_MIGRATIONS = set()
+
+
+def migration(version: int, description: str, shards: bool = False):
+    """
+    マイグレーション関数を登録するデコレータ。関数は engine を受け取る。
+    tasks / task_status_events / project_daily_stats / shard_state を変えるものは shards=True にする
+    （TASK_SHARDS_DIR のシャードにも同じ関数を適用する）。
+    """
+
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        if shards:
+            SHARD_MIGRATIONS.add(version)
+        return func
+
+    return decorator
+
+
+# ===== 稼働中の SQLite に対して安全に使える部品 =====
+# どれも何度実行しても結果が同じになるようにしてある（create_all 済みのDBでも通る）
+
+def column_exists(conn, table: str, column: str) -> bool:
+    rows = conn.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()
+    return any(r[1] == column for r in rows)
+
+
+def add_column(engine, table: str, column: str, ddl: str):
+    """
+    列を追加する。定数デフォルトの ADD COLUMN はスキーマの書き換えだけで済み、
+    既存行には触れないので、行数に関係なく一瞬で終わる。
+    """
+    with engine.begin() as conn:
+        if not column_exists(conn, table, column):
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def create_index(engine, name: str, table: str, columns, unique: bool = False):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+            f"ON {table} ({', '.join(columns)})"
+        )
+
+
+def create_table(engine, model):
+    """モデル定義どおりにテーブル（とインデックス）を作る。"""
+    model.__table__.create(bind=engine, checkfirst=True)
+
+
+def backfill(engine, table: str, assignments: str, where: str, params=None,
+             batch_size: int = BACKFILL_BATCH_SIZE, pause: float = BACKFILL_PAUSE):
+    """
+    UPDATE を batch_size 行ずつ短いトランザクションに分けて実行する。
+
+    1回のトランザクションで全行を更新すると、その間ずっと書き込みロックを
+    握ってしまうため、バッチごとに commit して他の書き込みを通す。
+    where は「まだ埋まっていない行」を表す条件にすること（繰り返しで0件になるまで回す）。
+    """
+    sql = text(
+        f"UPDATE {table} SET {assignments} "
+        f"WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT :_batch_size)"
+    )
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(sql, {**(params or {}), "_batch_size": batch_size}).rowcount
+        total += updated
+        if updated < batch_size:
+            return total
+        time.sleep(pause)
+
+
+# ===== マイグレーション本体 =====
+
+@migration(1, "users.is_approved を追加（旧 fix_db.py）")
+def _add_users_is_approved(engine):
+    add_column(engine, "users", "is_approved", "INTEGER NOT NULL DEFAULT 1")
+
+
+@migration(2, "project_members(user_id) にインデックスを追加")
+def _index_project_members_user_id(engine):
+    create_index(engine, "ix_project_members_user_id", "project_members", ["user_id"])
+
+
+@migration(3, "tasks(project_id, status) にインデックスを追加", shards=True)
+def _index_tasks_project_id_status(engine):
+    create_index(engine, "ix_tasks_project_id_status", "tasks", ["project_id", "status"])
+
+
+@migration(4, "projects.cache_version を追加")
+def _add_projects_cache_version(engine):
+    add_column(engine, "projects", "cache_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(5, "task_status_events / project_daily_stats を作成し、既存タスクの履歴を補完", shards=True)
+def _create_task_status_history(engine):
+    from .models.project_daily_stat import ProjectDailyStat
+    from .models.task_status_event import TaskStatusEvent
+
+    create_table(engine, TaskStatusEvent)
+    create_table(engine, ProjectDailyStat)
+
+    # 既存タスクの履歴を現在の状態から推定して入れる（作成 → doing/done）。
+    # タスクID の範囲ごとに短いトランザクションで入れる
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("SELECT 1 FROM task_status_events LIMIT 1").first():
+            return
+        max_id = conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM tasks").scalar()
+
+    statements = [
+        "INSERT INTO task_status_events (task_id, project_id, from_status, to_status, created_at)"
+        " SELECT id, project_id, NULL, 'todo', created_at FROM tasks WHERE id > :lo AND id <= :hi",
+        "INSERT INTO task_status_events (task_id, project_id, from_status, to_status, created_at)"
+        " SELECT id, project_id, 'todo', 'doing', updated_at FROM tasks"
+        " WHERE id > :lo AND id <= :hi AND status = 'doing'",
+        "INSERT INTO task_status_events (task_id, project_id, from_status, to_status, created_at)"
+        " SELECT id, project_id, 'todo', 'done', COALESCE(done_at, updated_at) FROM tasks"
+        " WHERE id > :lo AND id <= :hi AND status = 'done'",
+    ]
+    for lo in range(0, max_id, BACKFILL_BATCH_SIZE):
+        with engine.begin() as conn:
+            for sql in statements:
+                conn.execute(text(sql), {"lo": lo, "hi": lo + BACKFILL_BATCH_SIZE})
+        time.sleep(BACKFILL_PAUSE)
+
+
+@migration(6, "jobs（バックグラウンドジョブのキュー）を作成")
+def _create_jobs(engine):
+    from .models.job import Job
+
+    create_table(engine, Job)
+
+
+@migration(7, "tasks.version（楽観ロック用）を追加", shards=True)
+def _add_tasks_version(engine):
+    add_column(engine, "tasks", "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+@migration(8, "tasks.rank（列内の手動並び順）を追加し、今の表示順で採番", shards=True)
+def _add_tasks_rank(engine):
+    from .ranking import initial_ranks, rank_after
+
+    add_column(engine, "tasks", "rank", "VARCHAR(64) NOT NULL DEFAULT ''")
+    create_index(engine, "ix_tasks_project_id_status_rank", "tasks", ["project_id", "status", "rank"])
+    # (project_id, status) は新しいインデックスの先頭部分で引けるので不要
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_tasks_project_id_status")
+
+    with engine.connect() as conn:
+        columns = conn.exec_driver_sql(
+            "SELECT DISTINCT project_id, status FROM tasks WHERE rank = ''"
+        ).fetchall()
+
+    # 列（プロジェクト × ステータス）ごとに短いトランザクションで採番する。
+    # 並びはこれまでの表示順（期限 → 優先度 → 新しい順）に合わせる
+    for project_id, status in columns:
+        with engine.begin() as conn:
+            params = {"p": project_id, "s": status}
+            ids = [r[0] for r in conn.execute(text(
+                "SELECT id FROM tasks WHERE project_id = :p AND status = :s AND rank = '' "
+                "ORDER BY due_date IS NULL, due_date, "
+                "CASE priority WHEN 'high' THEN 0 WHEN 'mid' THEN 1 WHEN 'low' THEN 2 ELSE 9 END, "
+                "created_at DESC"
+            ), params)]
+            last = conn.execute(text(
+                "SELECT MAX(rank) FROM tasks WHERE project_id = :p AND status = :s AND rank != ''"
+            ), params).scalar()
+
+            if last is None:
+                ranks = initial_ranks(len(ids))
+            else:
+                ranks = []
+                for _ in ids:
+                    last = rank_after(last)
+                    ranks.append(last)
+
+            conn.execute(
+                text("UPDATE tasks SET rank = :r WHERE id = :id"),
+                [{"r": r, "id": task_id} for task_id, r in zip(ids, ranks)],
+            )
+        time.sleep(BACKFILL_PAUSE)
+
+
+@migration(9, "users.auth_version（ログインユーザーのスナップショット無効化用）を追加")
+def _add_users_auth_version(engine):
+    add_column(engine, "users", "auth_version", "INTEGER NOT NULL DEFAULT 1")
+
+
+# ===== 実行 =====
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " description TEXT NOT NULL,"
+            " applied_at TEXT NOT NULL)"
+        )
+
+
+def applied_versions(engine=None) -> set:
+    engine = engine or db.engine
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {r[0] for r in conn.exec_driver_sql("SELECT version FROM schema_migrations")}
+
+
+def pending_migrations(engine=None):
+    done = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def record_applied(engine, versions):
+    """version を適用済みとして記録する（モデルから作ったばかりのシャードなど）。"""
+    _ensure_version_table(engine)
+    descriptions = {version: description for version, description, _ in MIGRATIONS}
+    with engine.begin() as conn:
+        for version in versions:
+            conn.execute(
+                text(
+                    "INSERT OR IGNORE INTO schema_migrations (version, description, applied_at)"
+                    " VALUES (:v, :d, :t)"
+                ),
+                {"v": version, "d": descriptions[version], "t": datetime.utcnow().isoformat(timespec="seconds")},
+            )
+
+
+def shard_paths():
+    """TASK_SHARDS_DIR にあるシャードのファイル（TASK_SHARDING=0 のときも、あれば対象にする）。"""
+    return sorted(glob.glob(os.path.join(current_app.config["TASK_SHARDS_DIR"], "project_*.db")))
+
+
+def shard_engine(path: str):
+    # メイン DB を ATTACH していない素の接続を使う（ATTACH 先の同名テーブルと取り違えないように）
+    return create_engine("sqlite:///" + path)
+
+
+def pending_shard_migrations(engine):
+    return [m for m in pending_migrations(engine) if m[0] in SHARD_MIGRATIONS]
+
+
+def _apply(engine, migrations, target, echo):
+    count = 0
+    for version, description, func in migrations:
+        if target is not None and version > target:
+            break
+        echo(f"-> {version}: {description}")
+        func(engine)
+        record_applied(engine, [version])
+        count += 1
+    return count
+
+
+def run_migrations(target: int = None, echo=print):
+    """
+    未適用のマイグレーションを順に適用する。適用した件数を返す。
+    メイン DB のあと、各シャードに shards=True のものを適用する。
+    app context 内で呼ぶこと。
+    """
+    engine = db.engine
+    count = _apply(engine, pending_migrations(engine), target, echo)
+
+    for path in shard_paths():
+        engine = shard_engine(path)
+        try:
+            pending = pending_shard_migrations(engine)
+            if pending:
+                echo(f"[{os.path.basename(path)}]")
+            count += _apply(engine, pending, target, echo)
+        finally:
+            engine.dispose()
+    return count
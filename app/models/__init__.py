@@ -1,4 +1,8 @@
 from .user import User
 from .project import Project
 from .project_member import ProjectMember
-from .task import Task
\ No newline at end of file
+from .task import Task
+from .task_status_event import TaskStatusEvent
+from .project_daily_stat import ProjectDailyStat
+from .job import Job
+from .shard_state import ShardState
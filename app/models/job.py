@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+from ..extensions import db
+
+
+class Job(db.Model):
+    """
+    バックグラウンドで実行する重い処理（エクスポートなど）のキュー。
+
+    リクエストでは1行 INSERT して job の id を返すだけにし、
+    実際の処理はワーカー（app/jobs.py）が queued の行を取り出して行う。
+    """
+
+    __tablename__ = "jobs"
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    __table_args__ = (
+        # ワーカーが「実行可能な次の1件」を探す
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+
+    # この時刻以降に実行する（リトライ時は待ち時間ぶん後ろにずらす）
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_by = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def payload_data(self) -> dict:
+        return json.loads(self.payload or "{}")
+
+    @property
+    def result_data(self):
+        return json.loads(self.result) if self.result else None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "run_at": self.run_at.isoformat() if self.run_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result_data,
+            "error": self.error,
+        }
@@ -1,4 +1,5 @@
 from datetime import datetime
+from flask import current_app
 from ..extensions import db
 
 
@@ -15,6 +16,7 @@ class Project(db.Model):
         description (str | None): プロジェクト説明
         is_archived (bool): アーカイブ状態
         created_at (datetime): 作成日時（UTC）
+        cache_version (int): タスク変更のたびに進む版番号（画面キャッシュのキー）
     """
 
     __tablename__ = "projects"
@@ -41,4 +43,30 @@ class Project(db.Model):
         db.DateTime,
         nullable=False,
         default=datetime.utcnow,
-    )
\ No newline at end of file
+    )
+
+    # タスクが変わるたびに +1 する（フラグメントキャッシュのキーに使う）
+    cache_version = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+
+    @staticmethod
+    def bump_cache_version(project_id: int):
+        """
+        プロジェクトの版番号を進める。タスクを書き換えたのと同じトランザクション内で呼ぶ。
+        古い版のキャッシュは参照されなくなり、そのうち追い出される。
+        """
+        if "shard_router" in current_app.extensions:
+            # シャードモードではプロジェクトのシャード側で進める（メイン DB に書かない）
+            from ..sharding import bump_shard_cache_version
+
+            bump_shard_cache_version(project_id)
+            return
+        db.session.execute(
+            db.update(Project)
+            .where(Project.id == project_id)
+            .values(cache_version=Project.cache_version + 1)
+        )
\ No newline at end of file
@@ -0,0 +1,42 @@
+from ..extensions import db
+
+
+class ProjectDailyStat(db.Model):
+    """
+    プロジェクトの日次スナップショット。
+
+    その日の終わり時点のステータス別件数と、その日に完了したタスクの
+    サイクルタイム（最初に doing になってから done までの時間）を持つ。
+    task_status_events から前日分に差分を足して作るので、タスク全件を読み直さない。
+
+    制約:
+        - 同一プロジェクト・同一日付は1行
+    """
+
+    __tablename__ = "project_daily_stats"
+
+    __table_args__ = (
+        db.UniqueConstraint("project_id", "day", name="uq_project_daily_stats_project_day"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey("projects.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    # 日付（日本時間）
+    day = db.Column(db.Date, nullable=False)
+
+    todo_count = db.Column(db.Integer, nullable=False, default=0)
+    doing_count = db.Column(db.Integer, nullable=False, default=0)
+    done_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # その日に done になった件数
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # サイクルタイム（時間）。その日に完了したタスクが無ければ None
+    cycle_time_p50_hours = db.Column(db.Float, nullable=True)
+    cycle_time_p90_hours = db.Column(db.Float, nullable=True)
@@ -10,6 +10,9 @@ class ProjectMember(db.Model):
 
     制約:
         - 同一ユーザーが同一プロジェクトに重複登録されない
+
+    インデックス:
+        - user_id（ユーザー起点の所属プロジェクト検索）
     """
 
     __tablename__ = "project_members"
@@ -20,6 +23,8 @@ class ProjectMember(db.Model):
             "user_id",
             name="uq_project_user",
         ),
+        # 「自分の所属プロジェクト」検索（一覧・ダッシュボード）用
+        db.Index("ix_project_members_user_id", "user_id"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,20 @@
+from ..extensions import db
+
+
+class ShardState(db.Model):
+    """
+    プロジェクト別 SQLite（TASK_SHARDING=1）の管理情報。各シャードに1行だけ持つ。
+
+    シャードモードでは画面キャッシュの版番号をここで進める。
+    projects.cache_version（メイン DB）を書くと、タスクを書き換えるたびに
+    全プロジェクト共通のメイン DB の書き込みロックを取ることになるため。
+    """
+
+    __tablename__ = "shard_state"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    project_id = db.Column(db.Integer, nullable=False)
+
+    # タスクが変わるたびに +1 する（Project.cache_version の代わり）
+    cache_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
@@ -1,5 +1,7 @@
 from datetime import datetime, date
+from sqlalchemy import func
 from ..extensions import db
+from ..ranking import rank_between
 
 
 class Task(db.Model):
@@ -12,6 +14,12 @@ class Task(db.Model):
 
     __tablename__ = "tasks"
 
+    __table_args__ = (
+        # プロジェクト内のステータス別絞り込み・集計と、列内の並び順（rank）用。
+        # (project_id, status) だけの検索もこのインデックスの先頭部分で済む
+        db.Index("ix_tasks_project_id_status_rank", "project_id", "status", "rank"),
+    )
+
     # ===== 定数（文字列直書き防止） =====
     STATUS_TODO = "todo"
     STATUS_DOING = "doing"
@@ -48,6 +56,9 @@ class Task(db.Model):
 
     due_date = db.Column(db.Date, nullable=True)
 
+    # カンバンの列内での並び順（app/ranking.py の順位文字列。小さいほど上）
+    rank = db.Column(db.String(64), nullable=False, server_default="")
+
     assignee_id = db.Column(
         db.Integer,
         db.ForeignKey("users.id", ondelete="SET NULL"),
@@ -76,6 +87,29 @@ class Task(db.Model):
         onupdate=datetime.utcnow,
     )
 
+    # 楽観ロック用の版番号。ORM の UPDATE は「WHERE id = ? AND version = ?」になり、
+    # 他の人が先に更新していたら StaleDataError になる
+    version = db.Column(
+        db.Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
+    @staticmethod
+    def rank_at_end(project_id: int, status: str) -> str:
+        """その列の末尾に置くための順位（インデックスの末尾を1件読むだけ）。"""
+        # 変更途中のタスクを先に UPDATE しない（1回の変更で UPDATE が2回走り version が2つ進むのを防ぐ）
+        with db.session.no_autoflush:
+            last = (
+                db.session.query(func.max(Task.rank))
+                .filter(Task.project_id == project_id, Task.status == status)
+                .scalar()
+            )
+        return rank_between(last, None)
+
     # ===== relationships =====
     project = db.relationship("Project", backref="tasks")
 
@@ -0,0 +1,62 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class TaskStatusEvent(db.Model):
+    """
+    タスクのステータス変更履歴（追記のみ）。
+
+    ステータスを変えたのと同じトランザクションで1行追加する。
+    作成時は from_status=None → to_status="todo" の行を入れる。
+    日次スナップショット（ProjectDailyStat）はこの履歴から差分で組み立てる。
+    """
+
+    __tablename__ = "task_status_events"
+
+    __table_args__ = (
+        # プロジェクト単位で「ある時刻以降の履歴」を読む（スナップショット作成）
+        db.Index("ix_task_status_events_project_id_created_at", "project_id", "created_at"),
+        # タスクごとの開始時刻（サイクルタイム算出）
+        db.Index("ix_task_status_events_task_id_to_status", "task_id", "to_status"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    task_id = db.Column(
+        db.Integer,
+        db.ForeignKey("tasks.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey("projects.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    from_status = db.Column(db.String(20), nullable=True)
+    to_status = db.Column(db.String(20), nullable=False)
+
+    changed_by = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+    )
+
+    @staticmethod
+    def record(task_id: int, project_id: int, from_status, to_status, changed_by=None, at=None):
+        """履歴を1行追加する（commit は呼び出し側で行う）。"""
+        db.session.add(TaskStatusEvent(
+            task_id=task_id,
+            project_id=project_id,
+            from_status=from_status,
+            to_status=to_status,
+            changed_by=changed_by,
+            created_at=at or datetime.utcnow(),
+        ))
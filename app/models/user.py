@@ -21,6 +21,7 @@ class User(db.Model, UserMixin):
         is_locked (bool): ロック状態
         created_at (datetime): 作成日時（UTC）
         is_approved (bool): 管理者承認済みフラグ
+        auth_version (int): 権限・状態を変えるたびに上がる版番号（ログイン中のスナップショットの無効化用）
     """
 
     __tablename__ = "users"
@@ -57,4 +58,7 @@ class User(db.Model, UserMixin):
     )
 
     # 管理者承認フラグ
-    is_approved = db.Column(db.Boolean, nullable=False, default=False)
\ No newline at end of file
+    is_approved = db.Column(db.Boolean, nullable=False, default=False)
+
+    # 権限・有効/停止・ロック・承認を変えたら上げる（app.identity.invalidate_user）
+    auth_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
\ No newline at end of file
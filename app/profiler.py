@@ -0,0 +1,168 @@
+import heapq
+import json
+import logging
+import random
+import re
+import time
+from flask import g, has_request_context, request
+from .sharding import listen_engines
+
+logger = logging.getLogger("app.sql")
+
+# IN (?, ?, ?) のような可変長プレースホルダを1つの形にまとめる
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """パラメータ違いを同一視するためにSQL文を正規化する。"""
+    shape = _SPACE_RE.sub(" ", statement).strip()
+    return _IN_LIST_RE.sub("(?, ...)", shape)
+
+
+class RequestProfile:
+    """1リクエスト分のSQL実行記録。"""
+
+    __slots__ = ("count", "total", "statements", "slowest", "keep")
+
+    def __init__(self, keep: int):
+        self.count = 0
+        self.total = 0.0
+        self.statements = {}  # SQL文 → 実行回数
+        self.slowest = []  # (秒, 連番, SQL文) の min-heap
+        self.keep = keep
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+        item = (elapsed, self.count, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, item)
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def slowest_statements(self):
+        return [(sec, sql) for sec, _, sql in sorted(self.slowest, reverse=True)]
+
+    def repeated_shapes(self, threshold: int):
+        """同じ形のSQLが threshold 回以上出ていれば N+1 の疑いとして返す。"""
+        shapes = {}
+        for sql, n in self.statements.items():
+            key = statement_shape(sql)
+            shapes[key] = shapes.get(key, 0) + n
+        return sorted(
+            ((n, sql) for sql, n in shapes.items() if n >= threshold),
+            reverse=True,
+        )
+
+
+def current_profile():
+    """現在のリクエストがサンプリング対象なら RequestProfile を返す。"""
+    if not has_request_context():
+        return None
+    return g.get("_sql_profile")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None or current_profile() is None:
+        return
+    # 実行コンテキストは1回の実行ごとに作られるので、エラーで after が
+    # 呼ばれなくても開始時刻が残り続けることはない
+    context._profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    if profile is None:
+        return
+    start = getattr(context, "_profiler_start", None)
+    if start is None:
+        return
+    profile.record(statement, time.perf_counter() - start)
+
+
+def init_sql_profiler(app):
+    """
+    リクエストごとのクエリ数・DB時間・遅いSQLを記録し、
+    レスポンスヘッダ（X-DB-Queries / Server-Timing）と構造化ログに出す。
+
+    SQL_PROFILER_SAMPLE_RATE の割合のリクエストだけを計測するので、
+    本番でも低いレートで常時有効にしておける。
+    """
+    if not app.config.get("SQL_PROFILER_ENABLED"):
+        return
+
+    listen_engines(app, "before_cursor_execute", _before_cursor_execute)
+    listen_engines(app, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_profile():
+        rate = app.config["SQL_PROFILER_SAMPLE_RATE"]
+        if rate >= 1.0 or random.random() < rate:
+            g._sql_profile = RequestProfile(app.config["SQL_PROFILER_SLOWEST"])
+
+    @app.after_request
+    def finish_sql_profile(response):
+        if response.is_streamed:
+            # エクスポートなどのストリーミングは、本文を送りながらクエリを実行する。
+            # ヘッダーの時点の数は途中までなので印を付け、全体は送り終えて閉じるときにログに出す
+            profile = g.get("_sql_profile")
+            if profile is None:
+                return response
+            _set_headers(response, profile, partial=True)
+            info = _request_info(response)
+            threshold = app.config["SQL_PROFILER_N_PLUS_ONE_THRESHOLD"]
+            response.call_on_close(lambda: _log_profile(profile, info, threshold, streamed=True))
+            return response
+
+        profile = g.pop("_sql_profile", None)
+        if profile is None:
+            return response
+
+        _set_headers(response, profile)
+        _log_profile(profile, _request_info(response), app.config["SQL_PROFILER_N_PLUS_ONE_THRESHOLD"])
+        return response
+
+
+def _request_info(response) -> dict:
+    # ストリーミングではリクエストが終わった後にログを出すので、先に控えておく
+    return {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+    }
+
+
+def _set_headers(response, profile: RequestProfile, partial: bool = False):
+    db_ms = profile.total * 1000
+    response.headers["X-DB-Queries"] = str(profile.count)
+    if partial:
+        response.headers["X-DB-Queries-Partial"] = "1"
+        desc = f"{profile.count} queries before streaming"
+    else:
+        desc = f"{profile.count} queries"
+    response.headers.add("Server-Timing", f'db;dur={db_ms:.1f};desc="{desc}"')
+
+
+def _log_profile(profile: RequestProfile, info: dict, threshold: int, streamed: bool = False):
+    suspects = profile.repeated_shapes(threshold)
+    record = {
+        "event": "sql_profile",
+        **info,
+        "queries": profile.count,
+        "db_ms": round(profile.total * 1000, 2),
+        "slowest": [
+            {"ms": round(sec * 1000, 2), "sql": statement_shape(sql)}
+            for sec, sql in profile.slowest_statements()
+        ],
+    }
+    if streamed:
+        record["streamed"] = True
+    if suspects:
+        record["n_plus_one"] = [{"count": n, "sql": sql} for n, sql in suspects]
+        logger.warning(json.dumps(record, ensure_ascii=False))
+    else:
+        logger.info(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,83 @@
+"""
+カンバンの手動並び順に使う順位文字列（fractional index）。
+
+順位は 62 進数の小数 0.xxx の「xxx」部分で、文字列の大小（SQLite の BINARY 照合）が
+そのまま数値の大小になる。末尾に "0" は付けない（"V" と "V0" が同じ値にならないように）。
+2つの順位の間には必ず新しい順位を作れるので、カードを動かしても書き換えるのはその1行だけで済む。
+"""
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_INDEX = {c: i for i, c in enumerate(DIGITS)}
+
+
+def rank_after(before: str) -> str:
+    """before より後ろの順位。末尾に足し続けても長さがほとんど伸びないよう、桁を1つ繰り上げる。"""
+    for i, c in enumerate(before):
+        if c != DIGITS[-1]:
+            return before[:i] + DIGITS[_INDEX[c] + 1]
+    return before + DIGITS[BASE // 2]
+
+
+def rank_before(after: str) -> str:
+    """after より前の順位。先頭に足し続けても長さがほとんど伸びないよう、桁を1つ繰り下げる。"""
+    for i, c in enumerate(after):
+        # "1" を "0" にすると末尾が 0 になってしまうので、2 以上の桁だけ繰り下げる
+        if _INDEX[c] > 1:
+            return after[:i] + DIGITS[_INDEX[c] - 1]
+    return _midpoint("", after)
+
+
+def rank_between(before: str = None, after: str = None) -> str:
+    """
+    before < 結果 < after となる順位を返す。None はそれぞれ先頭・末尾を表す。
+    空文字（未採番の行）も None と同じに扱う。
+    """
+    before, after = before or None, after or None
+    if before is None and after is None:
+        return DIGITS[BASE // 2]
+    if after is None:
+        return rank_after(before)
+    if before is None:
+        return rank_before(after)
+    if before >= after:
+        raise ValueError(f"rank_between: {before!r} >= {after!r}")
+    return _midpoint(before, after)
+
+
+def _midpoint(a: str, b: str) -> str:
+    result = []
+    i = 0
+    while True:
+        da = _INDEX[a[i]] if i < len(a) else 0
+        db = BASE if b is None else (_INDEX[b[i]] if i < len(b) else 0)
+        if da == db:
+            result.append(DIGITS[da])
+        elif db - da > 1:
+            result.append(DIGITS[(da + db) // 2])
+            return "".join(result)
+        else:
+            # 隣り合う桁なので、この桁は a に合わせて、次の桁以降で a より大きくする
+            result.append(DIGITS[da])
+            b = None
+        i += 1
+
+
+def initial_ranks(count: int):
+    """
+    count 件ぶんの順位を等間隔で返す（バックフィル・再採番用）。
+    全件同じ桁数なので、どの隙間にも同じくらい挿入できる。
+    """
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+
+    ranks = []
+    for i in range(count):
+        value = (i + 1) * BASE ** width // (count + 1)
+        digits = []
+        for _ in range(width):
+            value, d = divmod(value, BASE)
+            digits.append(DIGITS[d])
+        ranks.append("".join(reversed(digits)).rstrip(DIGITS[0]))
+    return ranks
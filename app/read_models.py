@@ -0,0 +1,105 @@
+"""
+一覧画面用の読み取り専用モデル。
+
+一覧のテンプレートが読むのは数列だけなので、ORM のエンティティ（identity map への登録・
+変更追跡・全列の読み込み）は使わず、必要な列だけの SELECT を __slots__ 付きの
+dataclass に詰めて返す。書き換えが必要な処理では使わないこと。
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from sqlalchemy import select
+from .extensions import db
+from .models.project import Project
+from .models.project_member import ProjectMember
+from .models.task import Task
+from .models.user import User
+
+
+@dataclass(frozen=True, slots=True)
+class TaskCard:
+    """カンバンのカード1枚（tasks/_column.html）。"""
+
+    id: int
+    title: str
+    description: str
+    status: str
+    priority: str
+    due_date: date
+    done_at: datetime
+    version: int
+
+
+@dataclass(frozen=True, slots=True)
+class ProjectRow:
+    """プロジェクト一覧のカード1枚（projects/_card.html）。"""
+
+    id: int
+    name: str
+    description: str
+    cache_version: int
+
+
+@dataclass(frozen=True, slots=True)
+class UserRow:
+    """ユーザー管理の1行（admin/users.html）。"""
+
+    id: int
+    employee_id: int
+    name: str
+    role: str
+    is_active: bool
+    is_approved: bool
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class TaskOption:
+    """日誌の「関連タスク」の選択肢。"""
+
+    id: int
+    title: str
+
+
+def _rows(model, stmt):
+    return [model(*row) for row in db.session.execute(stmt)]
+
+
+def task_cards(project_id: int, status: str):
+    """列のカードを並び順で返す。(project_id, status, rank) のインデックス順に読むのでソート不要。"""
+    return _rows(TaskCard, (
+        select(
+            Task.id, Task.title, Task.description, Task.status, Task.priority,
+            Task.due_date, Task.done_at, Task.version,
+        )
+        .where(Task.project_id == project_id, Task.status == status)
+        .order_by(Task.rank)
+    ))
+
+
+def project_rows(user_id: int = None):
+    """プロジェクト一覧。user_id を渡すとそのユーザーが所属するものだけ。"""
+    stmt = select(Project.id, Project.name, Project.description, Project.cache_version)
+    if user_id is not None:
+        stmt = stmt.join(ProjectMember, Project.id == ProjectMember.project_id).where(
+            ProjectMember.user_id == user_id
+        )
+    return _rows(ProjectRow, stmt)
+
+
+def user_rows():
+    return _rows(UserRow, (
+        select(
+            User.id, User.employee_id, User.name, User.role,
+            User.is_active, User.is_approved, User.created_at,
+        )
+        .order_by(User.id.asc())
+    ))
+
+
+def task_options(project_id: int):
+    """新しい順。id は作成順に増えるので、created_at ではなく id で並べて一時ソートを避ける。"""
+    return _rows(TaskOption, (
+        select(Task.id, Task.title)
+        .where(Task.project_id == project_id)
+        .order_by(Task.id.desc())
+    ))
@@ -0,0 +1,237 @@
+"""
+プロジェクト別 SQLite へのシャーディング（TASK_SHARDING=1 のときだけ有効）。
+
+SQLite は同時に1つしか書き込めないので、全プロジェクトが1つの app.db を使うと
+あるプロジェクトのタスク更新が他のチームの書き込みを待たせる。
+シャードモードでは users / projects / project_members などはメイン DB に残し、
+タスク・ステータス履歴・日次スナップショットをプロジェクトごとのファイル
+（TASK_SHARDS_DIR/project_<id>.db）に置く。日誌はもともとプロジェクトごとのファイル。
+
+- どのシャードを使うかは g.shard_project_id で決まる。projects ブループリントでは
+  URL の project_id から自動で選び、ジョブ・CLI では use_shard() で囲む。
+- db.session（extensions.ShardRoutingSession）は文にタスク系のテーブルが含まれていれば
+  そのシャード、含まれていなければメイン DB に振り分ける。
+- シャードの接続にはメイン DB を "global" として ATTACH するので、
+  tasks と users / projects の JOIN はそのまま書ける（メイン側は読むだけ）。
+- ダッシュボードのようにプロジェクトをまたぐ集計は fan_out() で各シャードに投げて結果をまとめる。
+"""
+import os
+import threading
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context
+from sqlalchemy import create_engine, event, inspect, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.util import find_tables
+from .extensions import db
+from .migrate import SHARD_MIGRATIONS, record_applied
+from .models.project_daily_stat import ProjectDailyStat
+from .models.shard_state import ShardState
+from .models.task import Task
+from .models.task_status_event import TaskStatusEvent
+
+SHARDED_MODELS = (Task, TaskStatusEvent, ProjectDailyStat, ShardState)
+SHARDED_TABLES = frozenset(m.__table__ for m in SHARDED_MODELS)
+
+
+class ShardRouter:
+    """project_id → シャードの Engine。Engine は最初に使うときに作り、プロセス内で使い回す。"""
+
+    def __init__(self, main_path: str, shards_dir: str):
+        self.main_path = main_path
+        self.shards_dir = shards_dir
+        self._engines = {}
+        self._lock = threading.Lock()
+        self.listeners = []  # 新しいシャードの Engine にも付ける (イベント名, 関数)
+
+    def path_for(self, project_id: int) -> str:
+        return os.path.join(self.shards_dir, f"project_{project_id}.db")
+
+    def engine_for(self, project_id: int):
+        engine = self._engines.get(project_id)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(project_id)
+                if engine is None:
+                    engine = self._open(project_id)
+                    self._engines[project_id] = engine
+        return engine
+
+    def _open(self, project_id: int):
+        url = "sqlite:///" + self.path_for(project_id)
+
+        # テーブルはメイン DB を ATTACH する前に作る
+        # （ATTACH 後だとメイン DB の tasks を見て「もうある」と判断されてしまう）
+        plain = create_engine(url)
+        with plain.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            db.metadata.create_all(conn, tables=[m.__table__ for m in SHARDED_MODELS])
+            conn.commit()
+        # 今のモデルから作ったので、ここまでのマイグレーションは適用済み（以降は run_migrations が適用する）
+        record_applied(plain, SHARD_MIGRATIONS)
+        plain.dispose()
+
+        engine = create_engine(url)
+        main_path = self.main_path
+
+        @event.listens_for(engine, "connect")
+        def _attach_main(dbapi_conn, record):
+            dbapi_conn.execute("ATTACH DATABASE ? AS global", (main_path,))
+
+        for identifier, fn in self.listeners:
+            event.listen(engine, identifier, fn)
+
+        # 版番号はメイン DB の値の続きから始める（古い版のキャッシュを拾わないように）
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO shard_state (project_id, cache_version)"
+                " SELECT id, cache_version + 1 FROM global.projects"
+                " WHERE id = ? AND NOT EXISTS (SELECT 1 FROM shard_state)",
+                (project_id,),
+            )
+        return engine
+
+    def engine_for_statement(self, mapper, clause):
+        """文がタスク系のテーブルを含むなら、今選ばれているシャードの Engine を返す。"""
+        tables = set()
+        if mapper is not None:
+            tables.add(inspect(mapper).local_table)
+        if clause is not None:
+            tables.update(find_tables(clause, include_crud=True))
+        if not tables & SHARDED_TABLES:
+            return None
+
+        project_id = g.get("shard_project_id") if has_app_context() else None
+        if project_id is None:
+            raise RuntimeError("TASK_SHARDING: タスクを読み書きする前に use_shard(project_id) でシャードを選んでください")
+        return self.engine_for(project_id)
+
+
+def get_router():
+    return current_app.extensions.get("shard_router")
+
+
+def listen_engines(app, identifier, fn):
+    """メイン DB とシャードのすべての Engine に SQL のイベントリスナーを付ける（プロファイラ・メトリクス用）。"""
+    with app.app_context():
+        event.listen(db.engine, identifier, fn)
+    router = app.extensions.get("shard_router")
+    if router is not None:
+        router.listeners.append((identifier, fn))
+
+
+def select_shard(project_id: int):
+    """このリクエストで使うシャードを決める（projects ブループリントが URL から呼ぶ）。"""
+    g.shard_project_id = project_id
+
+
+def _forget_sharded_objects(flush: bool = True):
+    # 別のシャードには同じ id のタスクがあるので、切り替える前に identity map から外す
+    # （未反映の変更は今のシャードに書き出してから）
+    session = db.session
+    if flush:
+        session.flush()
+    for obj in list(session.identity_map.values()):
+        if obj.__table__ in SHARDED_TABLES:
+            session.expunge(obj)
+
+
+@contextmanager
+def use_shard(project_id: int):
+    """ブロックの中では project_id のシャードでタスクを読み書きする（ジョブ・CLI 用）。"""
+    previous = g.get("shard_project_id")
+    switching = get_router() is not None and previous != project_id
+    if switching:
+        _forget_sharded_objects()
+    g.shard_project_id = project_id
+    try:
+        yield
+    except BaseException:
+        # 失敗したときは呼び出し側がロールバックするので、書き出さずに外すだけ
+        if switching:
+            _forget_sharded_objects(flush=False)
+        raise
+    else:
+        if switching:
+            _forget_sharded_objects()
+    finally:
+        g.shard_project_id = previous
+
+
+def fan_out(project_ids, build):
+    """
+    build(project_ids) で作った SELECT をタスク側の DB で実行し、行をまとめて返す。
+    シャードモードではプロジェクトごとに build([project_id]) を各シャードへ投げて結果をつなげる。
+    集計を書くときは、行を足し合わせれば全体の値になる形（件数・合計）にすること。
+    """
+    project_ids = list(project_ids)
+    if not project_ids:
+        return []
+
+    router = get_router()
+    if router is None:
+        return db.session.execute(build(project_ids)).all()
+
+    rows = []
+    for project_id in project_ids:
+        with router.engine_for(project_id).connect() as conn:
+            rows.extend(conn.execute(build([project_id])).all())
+    return rows
+
+
+def cache_versions(projects):
+    """{project_id: 画面キャッシュの版番号}。シャードモードでは各シャードの shard_state から読む。"""
+    if get_router() is None:
+        return {p.id: p.cache_version for p in projects}
+    versions = {p.id: 0 for p in projects}
+    versions.update(fan_out(versions, lambda ids: select(ShardState.project_id, ShardState.cache_version)))
+    return versions
+
+
+def bump_shard_cache_version(project_id: int):
+    """プロジェクトのシャードの版番号を進める（Project.bump_cache_version から呼ばれる）。"""
+    with use_shard(project_id):
+        db.session.execute(
+            db.update(ShardState).values(cache_version=ShardState.cache_version + 1)
+        )
+
+
+def copy_project_to_shard(project_id: int) -> int:
+    """
+    メイン DB にあるプロジェクトのタスク・履歴・スナップショットをシャードへ移す。
+    シャードにすでにタスクがあれば何もしない。移したタスクの件数を返す。
+    メイン DB 側の行は同じトランザクションで消す（古い写しを誤って読み書きしないように）。
+    """
+    engine = get_router().engine_for(project_id)
+    with engine.begin() as conn:
+        if conn.exec_driver_sql("SELECT 1 FROM main.tasks LIMIT 1").first() is not None:
+            return 0
+        copied = 0
+        for model in (Task, TaskStatusEvent, ProjectDailyStat):
+            table = model.__tablename__
+            columns = ", ".join(f'"{c.name}"' for c in model.__table__.columns)
+            result = conn.exec_driver_sql(
+                f"INSERT INTO main.{table} ({columns})"
+                f" SELECT {columns} FROM global.{table} WHERE project_id = ?",
+                (project_id,),
+            )
+            if model is Task:
+                copied = result.rowcount
+        for model in (ProjectDailyStat, TaskStatusEvent, Task):
+            conn.exec_driver_sql(f"DELETE FROM global.{model.__tablename__} WHERE project_id = ?", (project_id,))
+    return copied
+
+
+def init_sharding(app):
+    if not app.config["TASK_SHARDING"]:
+        return
+
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise RuntimeError("TASK_SHARDING はメイン DB がファイルの SQLite のときだけ使えます")
+    main_path = url.database
+    if not os.path.isabs(main_path):
+        # Flask-SQLAlchemy と同じく、相対パスは instance フォルダ基準
+        main_path = os.path.join(app.instance_path, main_path)
+
+    os.makedirs(app.config["TASK_SHARDS_DIR"], exist_ok=True)
+    app.extensions["shard_router"] = ShardRouter(main_path, app.config["TASK_SHARDS_DIR"])
@@ -0,0 +1,76 @@
+import json
+import logging
+import threading
+import time
+from flask import g, request
+
+logger = logging.getLogger("app.startup")
+
+
+def init_startup_report(app, import_seconds: float):
+    """
+    ワーカー起動にかかった時間（import / create_app / 最初のリクエスト）を記録する。
+
+    結果は app.extensions["startup_timings"] に入り、最初のリクエストが終わった
+    時点で1行のJSONとしてログに出す。他のフックより先に登録して、
+    最初のリクエスト全体を計測できるよう create_app の冒頭で呼ぶ。
+    """
+    timings = {
+        "import_ms": round(import_seconds * 1000, 1),
+        "create_app_ms": None,
+        "first_request_ms": None,
+        "first_endpoint": None,
+    }
+    app.extensions["startup_timings"] = timings
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_first_request_timer():
+        if timings["first_request_ms"] is None:
+            g._startup_first_request = time.perf_counter()
+
+    @app.after_request
+    def report_first_request(response):
+        start = g.pop("_startup_first_request", None)
+        if start is None:
+            return response
+        with lock:
+            if timings["first_request_ms"] is None:
+                timings["first_request_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                timings["first_endpoint"] = request.endpoint or ""
+                logger.info(json.dumps({"event": "startup", **timings}, ensure_ascii=False))
+        return response
+
+
+def record_factory_time(app, factory_started: float):
+    """create_app の所要時間を記録する（create_app の最後で呼ぶ）。"""
+    app.extensions["startup_timings"]["create_app_ms"] = round(
+        (time.perf_counter() - factory_started) * 1000, 1
+    )
+
+
+def precompile_templates(app):
+    """
+    app/templates 以下を全てコンパイルし、Jinja のバイトコードキャッシュに書き出す。
+    (テンプレート数, 秒) を返す。
+    """
+    started = time.perf_counter()
+    names = app.jinja_env.list_templates(extensions=["html"])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - started
+
+
+# 新しいプロセスで起動時間を測るためのスクリプト
+MEASURE_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+app = create_app()
+t1 = time.perf_counter()
+app.test_client().get("/login")
+t2 = time.perf_counter()
+timings = dict(app.extensions["startup_timings"])
+timings["time_to_first_response_ms"] = round((t2 - t0) * 1000, 1)
+print(json.dumps(timings))
+"""
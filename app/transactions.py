@@ -0,0 +1,86 @@
+import logging
+import random
+import time
+from functools import wraps
+from flask import current_app, has_request_context, request, session
+from sqlalchemy.exc import OperationalError
+from . import metrics
+from .extensions import db
+
+logger = logging.getLogger("app.db")
+
+metrics.register_counter("app_db_busy_retries_total", "SQLite のロック待ちでやり直した回数", ("endpoint",))
+metrics.register_counter("app_db_busy_failures_total", "やり直しても書き込めなかった回数", ("endpoint",))
+
+# SQLite がロック中に返すエラーメッセージ
+BUSY_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+
+
+def is_busy_error(exc) -> bool:
+    """他の接続が書き込み中で SQLite が書けなかった（やり直せば通る）エラーかどうか。"""
+    if not isinstance(exc, OperationalError):
+        return False
+    message = str(exc.orig).lower()
+    return any(m in message for m in BUSY_MESSAGES)
+
+
+def busy_backoff(attempt: int, base: float, cap: float) -> float:
+    """full jitter の指数バックオフ（0 〜 base * 2^attempt の一様乱数、上限 cap）。"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def run_in_transaction(work, label: str = None):
+    """
+    work() を実行して commit する。途中で SQLite のロックに当たったら
+    ロールバックして work() ごとやり直す（DB_BUSY_RETRIES 回まで）。
+
+    work の中では commit せず、採番が必要なら flush() を使うこと。
+    そうすれば関連する INSERT / UPDATE がすべて1つのトランザクションに入る。
+    """
+    config = current_app.config
+    retries = config["DB_BUSY_RETRIES"]
+    label = label or (request.endpoint if has_request_context() else None) or "none"
+
+    # やり直すときに flash が二重に積まれないよう、開始時点の状態を覚えておく
+    flashes = list(session.get("_flashes", [])) if has_request_context() else None
+
+    attempt = 0
+    while True:
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if not is_busy_error(e):
+                raise
+            if attempt >= retries:
+                metrics.inc("app_db_busy_failures_total", (label,))
+                logger.warning("database still locked after %s retries: %s", retries, label)
+                raise
+            metrics.inc("app_db_busy_retries_total", (label,))
+            if flashes is not None:
+                session["_flashes"] = list(flashes)
+            time.sleep(busy_backoff(attempt, config["DB_BUSY_BACKOFF_BASE"], config["DB_BUSY_BACKOFF_MAX"]))
+            attempt += 1
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def transactional(view):
+    """
+    書き込みを行うビュー用のデコレータ（@login_required の内側に付ける）。
+
+    ビュー全体を1つのトランザクションとして実行し、戻ったところで commit する。
+    SQLite のロックに当たった場合はビューを最初からやり直す。
+    GET / HEAD は読み取りだけなのでそのまま呼ぶ。
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method in ("GET", "HEAD"):
+            return view(*args, **kwargs)
+        return run_in_transaction(lambda: view(*args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,230 @@
+import bisect
+import logging
+import threading
+import time
+import unicodedata
+from flask import current_app, has_app_context
+from sqlalchemy import String, cast, event, or_
+from . import metrics
+from .extensions import db
+from .models.user import User
+
+logger = logging.getLogger("app.user_search")
+
+metrics.register_counter("app_user_search_total", "ユーザー検索（前方一致）の回数", ("source",))
+
+USER_SEARCH_LIMIT = 10
+
+
+def normalize(text: str) -> str:
+    """全角英数・大文字小文字の違いを吸収する（ｙａｍａ → yama）。"""
+    return unicodedata.normalize("NFKC", text or "").strip().lower()
+
+
+def _is_eligible(user) -> bool:
+    # メンバーに追加できるのは承認済み・有効・ロックされていないユーザーだけ
+    return bool(user.is_approved and user.is_active and not user.is_locked)
+
+
+class UserPrefixIndex:
+    """
+    社員番号と名前の前方一致検索用のインデックス。
+
+    (キー, user_id) をソートした配列を2本持ち、bisect で先頭位置を求めて
+    前方一致する範囲だけを読む。追加・削除も bisect で位置を探して1件ずつ行う。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = []
+        self._by_name = []
+        self._users = {}  # user_id → (employee_id, name)
+        self.ready = False
+        self.building = False
+        self.built_at = 0.0
+        self._pending = []  # 構築中に届いた変更（構築後に適用する）
+
+    @staticmethod
+    def _name_keys(name: str):
+        # 「山田 太郎」は「山田」でも「太郎」でも引けるようにする
+        full = normalize(name)
+        keys = {full}
+        keys.update(part for part in full.split() if part)
+        return keys
+
+    def _add(self, user_id, employee_id, name):
+        self._users[user_id] = (employee_id, name)
+        bisect.insort(self._by_id, (str(employee_id), user_id))
+        for key in self._name_keys(name):
+            bisect.insort(self._by_name, (key, user_id))
+
+    def _remove(self, user_id):
+        found = self._users.pop(user_id, None)
+        if found is None:
+            return
+        employee_id, name = found
+        for array, keys in ((self._by_id, [str(employee_id)]), (self._by_name, self._name_keys(name))):
+            for key in keys:
+                i = bisect.bisect_left(array, (key, user_id))
+                if i < len(array) and array[i] == (key, user_id):
+                    del array[i]
+
+    def _apply(self, changes):
+        for user_id, employee_id, name, eligible in changes:
+            self._remove(user_id)
+            if eligible:
+                self._add(user_id, employee_id, name)
+
+    def apply(self, changes):
+        """commit 済みの変更 [(user_id, employee_id, name, 追加可能か), ...] を反映する。"""
+        with self._lock:
+            if self.building:
+                self._pending.extend(changes)
+            if self.ready:
+                self._apply(changes)
+
+    def load(self, rows):
+        """全件を読み直して差し替える。rows は (user_id, employee_id, name) のリスト。"""
+        by_id = sorted((str(employee_id), user_id) for user_id, employee_id, name in rows)
+        by_name = sorted(
+            (key, user_id) for user_id, employee_id, name in rows for key in self._name_keys(name)
+        )
+        users = {user_id: (employee_id, name) for user_id, employee_id, name in rows}
+        with self._lock:
+            self._by_id, self._by_name, self._users = by_id, by_name, users
+            self._apply(self._pending)
+            self._pending = []
+            self.ready = True
+            self.building = False
+            self.built_at = time.monotonic()
+
+    @staticmethod
+    def _scan(array, prefix, found, limit):
+        """
+        prefix で始まるキーの user_id を found に足していく（found が limit 件になるまで）。
+        1人に名前のキーが複数ある（フルネームと姓・名）ので、found にある id は数えずに飛ばす。
+        """
+        seen = set(found)
+        i = bisect.bisect_left(array, (prefix,))
+        while i < len(array) and len(found) < limit and array[i][0].startswith(prefix):
+            user_id = array[i][1]
+            if user_id not in seen:
+                seen.add(user_id)
+                found.append(user_id)
+            i += 1
+        return found
+
+    def search(self, query: str, limit: int = USER_SEARCH_LIMIT):
+        """社員番号の前方一致 → 名前の前方一致の順に、(user_id, employee_id, name) を返す。"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            ids = self._scan(self._by_id, prefix, [], limit) if prefix.isdigit() else []
+            self._scan(self._by_name, prefix, ids, limit)
+            return [(user_id, *self._users[user_id]) for user_id in ids]
+
+
+def _eligible_rows():
+    return db.session.execute(
+        db.select(User.id, User.employee_id, User.name).where(
+            User.is_approved.is_(True),
+            User.is_active.is_(True),
+            User.is_locked.is_(False),
+        )
+    ).all()
+
+
+def _build_in_background(app, index):
+    def build():
+        with app.app_context():
+            try:
+                index.load(_eligible_rows())
+            except Exception:
+                logger.exception("user index build failed")
+                with index._lock:
+                    index.building = False
+            finally:
+                db.session.remove()
+
+    threading.Thread(target=build, name="user-index-build", daemon=True).start()
+
+
+def _ensure_fresh(app, index):
+    """
+    未構築、または USER_SEARCH_INDEX_TTL 秒より古ければ裏で作り直す。
+    （他のワーカープロセスでの変更は届かないので、一定時間ごとに全件を読み直す）
+    """
+    ttl = app.config["USER_SEARCH_INDEX_TTL"]
+    stale = not index.ready or (ttl > 0 and time.monotonic() - index.built_at > ttl)
+    if not stale:
+        return
+    with index._lock:
+        if index.building:
+            return
+        index.building = True
+    _build_in_background(app, index)
+
+
+def _search_sql(query: str, limit: int):
+    """インデックスが温まるまでの代わり（LIKE の前方一致）。"""
+    prefix = (query or "").strip()
+    if not prefix:
+        return []
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    rows = db.session.execute(
+        db.select(User.id, User.employee_id, User.name)
+        .where(
+            User.is_approved.is_(True),
+            User.is_active.is_(True),
+            User.is_locked.is_(False),
+            or_(
+                cast(User.employee_id, String).like(f"{escaped}%", escape="\\"),
+                User.name.like(f"{escaped}%", escape="\\"),
+            ),
+        )
+        .order_by(User.employee_id)
+        .limit(limit)
+    ).all()
+    return [tuple(r) for r in rows]
+
+
+def search_users(query: str, limit: int = USER_SEARCH_LIMIT):
+    """メンバーに追加できるユーザーを前方一致で探し、(user_id, employee_id, name) のリストを返す。"""
+    app = current_app._get_current_object()
+    index = app.extensions["user_index"]
+    _ensure_fresh(app, index)
+
+    if index.ready:
+        metrics.inc("app_user_search_total", ("index",))
+        return index.search(query, limit)
+
+    metrics.inc("app_user_search_total", ("sql",))
+    return _search_sql(query, limit)
+
+
+def user_changed(user):
+    """
+    ユーザーの承認・有効/停止・新規登録をインデックスに反映するよう予約する。
+    反映は commit が成功した後（ロールバックされたら捨てる）。
+    """
+    changes = db.session.info.setdefault("user_index_changes", [])
+    changes.append((user.id, user.employee_id, user.name, _is_eligible(user)))
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_user_changes(session):
+    changes = session.info.pop("user_index_changes", None)
+    if changes and has_app_context():
+        index = current_app.extensions.get("user_index")
+        if index is not None:
+            index.apply(changes)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop("user_index_changes", None)
+
+
+def init_user_search(app):
+    app.extensions["user_index"] = UserPrefixIndex()
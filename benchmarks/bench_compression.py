@@ -0,0 +1,74 @@
+"""
+レスポンス圧縮（app/compression.py）のベンチマーク：CPU 時間と減ったバイト数。
+
+大きいカンバン・ユーザー一覧・タスクのエクスポート（CSV）を圧縮なしで取得し、
+その本文を gzip の各レベル（brotli があれば各品質）で圧縮したときの
+圧縮後のサイズと CPU 時間（process_time）を表示する。
+エクスポートはストリーミングと同じく COMPRESSION_STREAM_BUFFER ごとに区切って圧縮する。
+
+    python benchmarks/bench_compression.py [タスク数]
+"""
+import sys
+import time
+from common import login, make_app, seed
+from app.compression import _Compressor, brotli, compress
+
+TASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+REPEAT = 10
+SETTINGS = [("gzip", level) for level in (1, 6, 9)]
+if brotli is not None:
+    SETTINGS += [("br", quality) for quality in (1, 4, 11)]
+
+
+def config_for(app, encoding, level):
+    config = dict(app.config)
+    config["COMPRESSION_GZIP_LEVEL" if encoding == "gzip" else "COMPRESSION_BROTLI_QUALITY"] = level
+    return config
+
+
+def compress_chunked(data, encoding, config):
+    compressor = _Compressor(encoding, config)
+    size = config["COMPRESSION_STREAM_BUFFER"]
+    out = [compressor.feed(data[i:i + size]) for i in range(0, len(data), size)]
+    out.append(compressor.finish())
+    return b"".join(out)
+
+
+def cpu_ms(func):
+    """(1回あたりの CPU ミリ秒, 最後の結果)。"""
+    started = time.process_time()
+    for _ in range(REPEAT):
+        result = func()
+    return (time.process_time() - started) * 1000 / REPEAT, result
+
+
+def main():
+    app = make_app()
+    pid = seed(app, projects=1, tasks_per_project=TASKS, members=50)[0]
+    member = login(app)
+    admin = login(app, 9999)
+
+    # Accept-Encoding を付けなければ圧縮されない
+    pages = [
+        ("board", member.get(f"/projects/{pid}/tasks").data, compress),
+        ("users", admin.get("/admin/users").data, compress),
+        ("export", member.get(f"/projects/{pid}/export/tasks.csv").data, compress_chunked),
+    ]
+
+    if brotli is None:
+        print("brotli モジュールが無いので gzip だけ測ります")
+    print(f"tasks={TASKS} repeat={REPEAT}")
+    for name, body, func in pages:
+        print(f"{name}: {len(body) / 1024:.0f}KiB")
+        for encoding, level in SETTINGS:
+            config = config_for(app, encoding, level)
+            ms, out = cpu_ms(lambda: func(body, encoding, config))
+            saved = len(body) - len(out)
+            print(
+                f"  {encoding:4s} {level:2d}  {len(out) / 1024:7.0f}KiB ({len(out) / len(body):5.1%})"
+                f"  cpu={ms:7.2f}ms  {ms / (saved / 1024 / 1024):6.1f}ms/MiB saved"
+            )
+
+
+if __name__ == "__main__":
+    main()
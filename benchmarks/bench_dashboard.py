@@ -0,0 +1,67 @@
+"""
+ダッシュボードのベンチマーク。
+
+所属プロジェクトのタスク数を増やしながら、集計を毎回行う場合（DASHBOARD_CACHE_TTL=0）と
+ユーザーごとのキャッシュが効いている場合の1リクエストあたりの時間を比べる。
+
+    python benchmarks/bench_dashboard.py
+"""
+from datetime import date, timedelta
+from common import login, make_app, seed, timeit
+from app.extensions import db
+from app.models import Task
+from app.sharding import use_shard
+
+SIZES = (1_000, 10_000, 50_000)
+PROJECTS = 10
+REPEAT = 30
+
+
+def add_tasks(app, project_ids, count):
+    """プロジェクトに均等にタスクを足す（担当は社員番号 1000 のユーザーに寄せる）。"""
+    statuses = [Task.STATUS_TODO, Task.STATUS_DOING, Task.STATUS_DONE]
+    today = date.today()
+    with app.app_context():
+        for pid in project_ids:
+            rows = [
+                {
+                    "project_id": pid,
+                    "title": f"追加タスク{i}",
+                    "status": statuses[i % 3],
+                    "priority": Task.PRIORITY_MID,
+                    "due_date": today + timedelta(days=i % 30 - 10),
+                    "assignee_id": 2 + i % 3,
+                    "created_by": 2,
+                    "rank": f"z{i:08d}",
+                }
+                for i in range(count // len(project_ids))
+            ]
+            with use_shard(pid):
+                db.session.execute(Task.__table__.insert(), rows)
+        db.session.commit()
+
+
+def main():
+    app = make_app()
+    project_ids = seed(app, projects=PROJECTS, tasks_per_project=0)
+    client = login(app)
+
+    def dashboard():
+        assert client.get("/dashboard").status_code == 200
+
+    total = 0
+    print(f"projects={PROJECTS} repeat={REPEAT}")
+    for size in SIZES:
+        add_tasks(app, project_ids, size - total)
+        total = size
+
+        app.config["DASHBOARD_CACHE_TTL"] = 0
+        uncached = timeit(dashboard, REPEAT)
+        app.config["DASHBOARD_CACHE_TTL"] = 30
+        dashboard()  # キャッシュを温める
+        cached = timeit(dashboard, REPEAT)
+        print(f"tasks={size:6d}  query={uncached:7.2f}ms  cached={cached:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+フラグメントキャッシュのベンチマーク。
+
+カンバン（/projects/<id>/tasks）とプロジェクト一覧（/projects/）を
+キャッシュ無効・有効で描画し、1リクエストあたりの時間とヒット率を比べる。
+
+    python benchmarks/bench_fragment_cache.py [タスク数]
+"""
+import sys
+from common import login, make_app, seed, timeit
+
+TASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+REPEAT = 30
+
+
+def main():
+    app = make_app()
+    project_ids = seed(app, projects=20, tasks_per_project=TASKS // 20 or 1)
+    client = login(app)
+    pid = project_ids[0]
+
+    def board():
+        assert client.get(f"/projects/{pid}/tasks").status_code == 200
+
+    def projects():
+        assert client.get("/projects/").status_code == 200
+
+    print(f"tasks={TASKS} projects={len(project_ids)} repeat={REPEAT}")
+    for enabled in (False, True):
+        app.config["FRAGMENT_CACHE_ENABLED"] = enabled
+        app.extensions["fragment_cache"].local.clear()
+        board()
+        projects()  # 1回目でキャッシュを温める
+        label = "cache on " if enabled else "cache off"
+        print(f"{label}  board={timeit(board, REPEAT):7.2f}ms  projects={timeit(projects, REPEAT):7.2f}ms")
+
+    print("stats:", app.extensions["fragment_cache"].stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+エンドポイントごとの SQL 発行数（X-DB-Queries ヘッダー）を表示するベンチマーク。
+
+ログインユーザーのスナップショットを使わない場合（USER_SNAPSHOT_TTL=0）と
+使う場合を並べて表示し、使う場合の数が BUDGET を超えたとき、またはスナップショットで
+クエリが減っていないときは終了コード 1 で終わる。
+フラグメントキャッシュが温まった状態（2回目以降のリクエスト）で数える。
+BUDGET は TASK_SHARDING=0 のときの値（シャードモードでは版番号の読み込みがプロジェクトごとに1回増える）。
+
+最後に、別のプロセスでユーザーを停止したとき、このプロセスのスナップショットが
+使われずにログアウトされること、停止していない他のユーザーのスナップショットは
+そのまま使われる（クエリが増えない）ことも確かめる。
+
+    python benchmarks/bench_query_counts.py
+"""
+import os
+import subprocess
+import sys
+
+os.environ["SQL_PROFILER_SAMPLE_RATE"] = "1"
+
+from common import login, make_app, seed  # noqa: E402
+
+# スナップショットありでのクエリ数の上限
+BUDGET = {
+    "/dashboard": 1,
+    "/projects/": 1,
+    "/projects/{pid}/tasks": 1,
+    "/projects/{pid}/members": 2,
+    "/projects/{pid}/analytics": 4,
+    "/projects/{pid}/members/search?q=1": 2,
+}
+
+
+def count_queries(client, path):
+    client.get(path)  # キャッシュを温める
+    r = client.get(path)
+    assert r.status_code == 200, (path, r.status_code)
+    return int(r.headers["X-DB-Queries"])
+
+
+# 別プロセスで社員番号 1000 のユーザーを停止する（同じ DB・USER_SNAPSHOT_EPOCH_DIR を環境変数で引き継ぐ）
+DEACTIVATE_SCRIPT = """
+from common import make_app
+from app.extensions import db
+from app.identity import invalidate_user
+from app.models import User
+app = make_app()
+with app.app_context():
+    user = User.query.filter_by(employee_id=1000).one()
+    user.is_active = False
+    invalidate_user(user)
+    db.session.commit()
+"""
+
+
+def deactivated_elsewhere(app, client, other) -> tuple:
+    """
+    停止が他のプロセスで commit された後、(次のリクエストがログイン画面に送られるか,
+    他のユーザー other のスナップショットが使われ続けるか)。
+    """
+    app.config["USER_SNAPSHOT_TTL"] = 60
+    assert client.get("/dashboard").status_code == 200
+    other_before = count_queries(other, "/dashboard")
+    subprocess.run(
+        [sys.executable, "-c", DEACTIVATE_SCRIPT],
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+    )
+    r = client.get("/dashboard")
+    logged_out = r.status_code == 302 and "/login" in r.headers["Location"]
+    r = other.get("/dashboard")
+    others_kept = r.status_code == 200 and int(r.headers["X-DB-Queries"]) == other_before
+    return logged_out, others_kept
+
+
+def main():
+    app = make_app()
+    pid = seed(app, projects=1, tasks_per_project=300, members=5)[0]
+    client = login(app, 1000)
+
+    over = []
+    print(f"{'endpoint':40s} {'ttl=0':>6s} {'snapshot':>9s} {'budget':>7s}")
+    for template, budget in BUDGET.items():
+        path = template.format(pid=pid)
+        app.config["USER_SNAPSHOT_TTL"] = 0
+        without = count_queries(client, path)
+        app.config["USER_SNAPSHOT_TTL"] = 60
+        with_snapshot = count_queries(client, path)
+        if with_snapshot > budget:
+            mark = "  <-- over budget"
+        elif with_snapshot >= without:
+            mark = "  <-- snapshot saved no query"
+        else:
+            mark = ""
+        print(f"{path:40s} {without:6d} {with_snapshot:9d} {budget:7d}{mark}")
+        if mark:
+            over.append(path)
+
+    logged_out, others_kept = deactivated_elsewhere(app, client, login(app, 1001))
+    print(f"deactivated in another process -> logged out: {logged_out}, other users' snapshots kept: {others_kept}")
+
+    if over or not logged_out or not others_kept:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+一覧画面の読み込み：ORM のエンティティと読み取り専用モデル（app/read_models.py）の比較。
+
+1万行のカンバン（1プロジェクト）・ユーザー一覧・日誌のタスク選択肢を、それぞれの方法で
+読み込んだときの時間と、tracemalloc で測ったメモリの最大使用量を表示する。
+
+    python benchmarks/bench_read_models.py [行数]
+"""
+import sys
+import time
+import tracemalloc
+from common import PASSWORD, make_app, seed
+from werkzeug.security import generate_password_hash
+from app.extensions import db
+from app.models import Task, User
+from app.read_models import task_cards, task_options, user_rows
+from app.sharding import use_shard
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+REPEAT = 5
+STATUSES = (Task.STATUS_TODO, Task.STATUS_DOING, Task.STATUS_DONE)
+
+
+def measure(func):
+    """
+    (1回あたりのミリ秒, 最大メモリ KiB)。毎回 session を作り直して identity map を空にする。
+    tracemalloc を付けると遅くなるので、時間とメモリは別々に測る。
+    """
+    elapsed = 0.0
+    for _ in range(REPEAT):
+        db.session.remove()
+        started = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - started
+
+    db.session.remove()
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return elapsed * 1000 / REPEAT, peak / 1024
+
+
+def main():
+    app = make_app()
+    pid = seed(app, projects=1, tasks_per_project=ROWS, members=1)[0]
+    with app.app_context():
+        pw = generate_password_hash(PASSWORD)
+        db.session.execute(User.__table__.insert(), [
+            {"employee_id": 100_000 + i, "name": f"ユーザー{i}", "password_hash": pw,
+             "role": "member", "is_active": True, "is_approved": True, "is_locked": False,
+             "failed_login_attempts": 0}
+            for i in range(ROWS)
+        ])
+        db.session.commit()
+
+    cases = [
+        ("board", lambda: [
+            Task.query.filter_by(project_id=pid, status=s).order_by(Task.rank).all() for s in STATUSES
+        ], lambda: [task_cards(pid, s) for s in STATUSES]),
+        ("users", lambda: User.query.order_by(User.id.asc()).all(), user_rows),
+        ("journal", lambda: Task.query.filter_by(project_id=pid).order_by(Task.created_at.desc()).all(),
+         lambda: task_options(pid)),
+    ]
+
+    print(f"rows={ROWS} repeat={REPEAT}")
+    with app.app_context(), use_shard(pid):
+        for name, orm, read_model in cases:
+            orm_ms, orm_kib = measure(orm)
+            rm_ms, rm_kib = measure(read_model)
+            print(
+                f"{name:8s} orm={orm_ms:7.1f}ms {orm_kib:8.0f}KiB  "
+                f"read_model={rm_ms:7.1f}ms {rm_kib:8.0f}KiB  ({orm_kib / rm_kib:4.1f}x less memory)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+プロジェクト別シャーディング（TASK_SHARDING）の書き込みスループットのベンチマーク。
+
+projects 個のプロジェクトに1プロセスずつ書き込み役を割り当て、それぞれが自分のプロジェクトの
+タスクのステータスを変え続ける（プロジェクト間で競合はしない）。書き込み役は別々のプロセスなので
+GIL を取り合わず、Web ワーカーを複数立てたときと同じように同じ DB ファイルを奪い合う。
+
+1つの app.db を共有する場合とプロジェクトごとのシャードの場合を、メイン DB の
+ジャーナルモード（delete / wal）ごとに計測する（シャードは常に WAL）。
+同じジャーナルモードの行どうしを比べれば、差はシャーディングだけの効果になる。
+
+    python benchmarks/bench_shard_writes.py [秒数] [プロジェクト数]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+PROJECTS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+NEXT_ACTION = {"todo": "start", "doing": "done", "done": "reset"}
+
+
+def run_seed():
+    """DB とシャードを作り、メイン DB のジャーナルモードを設定して、プロジェクト id を出力する。"""
+    from common import make_app, seed
+    from app.extensions import db
+
+    app = make_app()
+    pids = seed(app, projects=PROJECTS, tasks_per_project=50, members=PROJECTS)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            # journal_mode=WAL はファイルに残るので、後から開く書き込み役にも効く
+            conn.exec_driver_sql(f"PRAGMA journal_mode={os.environ['BENCH_JOURNAL']}")
+    print(json.dumps(pids))
+
+
+def run_writer():
+    """1つのプロジェクトのタスクを DURATION 秒間動かし続け、(成功, 失敗) を出力する。"""
+    import time
+    from common import login, make_app
+    from app.models import Task
+    from app.sharding import use_shard
+
+    pid = int(os.environ["BENCH_PROJECT"])
+    app = make_app()
+    with app.app_context(), use_shard(pid):
+        known = {
+            t.id: (t.status, t.version)
+            for t in Task.query.filter_by(project_id=pid).limit(20)
+        }
+    client = login(app, int(os.environ["BENCH_MEMBER"]))
+
+    # 全員の準備ができてから一斉に始める
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    ok = errors = 0
+    deadline = time.perf_counter() + DURATION
+    while time.perf_counter() < deadline:
+        for task_id, (status, version) in list(known.items()):
+            r = client.post(
+                f"/projects/{pid}/tasks/{task_id}/status",
+                data={"action": NEXT_ACTION[status], "version": version},
+                headers={"Accept": "application/json"},
+            )
+            if r.status_code == 200:
+                state = r.get_json()["task"]
+                known[task_id] = (state["status"], state["version"])
+                ok += 1
+            else:
+                errors += 1
+    print(json.dumps([ok, errors]), flush=True)
+
+
+def measure(sharding: str, journal: str):
+    tmp = tempfile.mkdtemp(prefix="todo_bench_shards_")
+    env = dict(
+        os.environ,
+        TASK_SHARDING=sharding,
+        BENCH_JOURNAL=journal,
+        DATABASE_URL="sqlite:///" + os.path.join(tmp, "bench.db"),
+        TASK_SHARDS_DIR=os.path.join(tmp, "shards"),
+        METRICS_DIR=os.path.join(tmp, "metrics"),
+        JINJA_BYTECODE_CACHE_DIR=os.path.join(tmp, "jinja_cache"),
+        USER_SNAPSHOT_EPOCH_DIR=os.path.join(tmp, "auth_epochs"),
+    )
+    seeded = subprocess.run(
+        [sys.executable, __file__, *sys.argv[1:]],
+        env=dict(env, BENCH_ROLE="seed"), check=True, capture_output=True, text=True,
+    )
+    pids = json.loads(seeded.stdout.strip().splitlines()[-1])
+
+    writers = [
+        subprocess.Popen(
+            [sys.executable, __file__, *sys.argv[1:]],
+            env=dict(env, BENCH_ROLE="writer", BENCH_PROJECT=str(pid), BENCH_MEMBER=str(1000 + i)),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        for i, pid in enumerate(pids)
+    ]
+    for w in writers:
+        assert w.stdout.readline().strip() == "ready"
+    for w in writers:
+        w.stdin.write("go\n")
+        w.stdin.flush()
+
+    ok = errors = 0
+    for w in writers:
+        out, _ = w.communicate()
+        done, failed = json.loads(out.strip().splitlines()[-1])
+        ok += done
+        errors += failed
+        if w.returncode:
+            raise SystemExit(f"writer exited with {w.returncode}")
+
+    mode = "sharded" if sharding == "1" else "single"
+    print(f"{mode:8s} main={journal:6s} processes={PROJECTS}  updates/s={ok / DURATION:8.1f}  errors={errors}")
+
+
+def main():
+    print(f"duration={DURATION}s projects={PROJECTS}")
+    for journal in ("delete", "wal"):
+        for sharding in ("0", "1"):
+            measure(sharding, journal)
+
+
+if __name__ == "__main__":
+    role = os.environ.get("BENCH_ROLE")
+    if role == "seed":
+        run_seed()
+    elif role == "writer":
+        run_writer()
+    else:
+        main()
@@ -0,0 +1,87 @@
+"""
+タスクのステータス変更（楽観ロック）の競合ベンチマーク。
+
+writers 個のスレッドが、少数のタスクに対して同時にステータス変更を送り続ける。
+409 が返ったら本文の最新の版番号で送り直す。成功した更新数／秒と競合率を表示し、
+最後に「成功した更新数 = 版番号の増分の合計」（上書きによる更新の消失がない）ことを確かめる。
+
+    python benchmarks/bench_task_contention.py [秒数] [対象タスク数]
+"""
+import random
+import sys
+import threading
+import time
+from common import login, make_app, seed
+from app.extensions import db
+from app.models import Task
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+HOT_TASKS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+WRITERS = (1, 2, 4, 8)
+
+NEXT_ACTION = {"todo": "start", "doing": "done", "done": "reset"}
+
+
+def writer(client, pid, tasks, deadline, counts):
+    known = dict(tasks)  # task_id → (status, version)
+    ok = conflicts = 0
+    while time.perf_counter() < deadline:
+        task_id = random.choice(list(known))
+        status, version = known[task_id]
+        r = client.post(
+            f"/projects/{pid}/tasks/{task_id}/status",
+            data={"action": NEXT_ACTION[status], "version": version},
+            headers={"Accept": "application/json"},
+        )
+        state = r.get_json()["task"]
+        known[task_id] = (state["status"], state["version"])
+        if r.status_code == 200:
+            ok += 1
+        else:
+            assert r.status_code == 409, r.status_code
+            conflicts += 1
+    counts.append((ok, conflicts))
+
+
+def versions(app, task_ids):
+    with app.app_context():
+        return sum(v for (v,) in db.session.query(Task.version).filter(Task.id.in_(task_ids)))
+
+
+def main():
+    app = make_app()
+    pid = seed(app, projects=1, tasks_per_project=200, members=max(WRITERS))[0]
+
+    with app.app_context():
+        hot = [(t.id, (t.status, t.version)) for t in Task.query.filter_by(project_id=pid).limit(HOT_TASKS)]
+    task_ids = [task_id for task_id, _ in hot]
+
+    # ログイン（パスワードハッシュの検証）は計測に含めない
+    clients = [login(app, 1000 + i) for i in range(max(WRITERS))]
+
+    print(f"duration={DURATION}s hot_tasks={HOT_TASKS}")
+    for n in WRITERS:
+        with app.app_context():
+            hot = [(t.id, (t.status, t.version)) for t in Task.query.filter(Task.id.in_(task_ids))]
+        before = versions(app, task_ids)
+
+        counts = []
+        deadline = time.perf_counter() + DURATION
+        threads = [
+            threading.Thread(target=writer, args=(clients[i], pid, hot, deadline, counts))
+            for i in range(n)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        ok = sum(c[0] for c in counts)
+        conflicts = sum(c[1] for c in counts)
+        lost = ok - (versions(app, task_ids) - before)
+        rate = conflicts / (ok + conflicts) if ok + conflicts else 0.0
+        print(f"writers={n}  updates/s={ok / DURATION:8.1f}  conflicts={conflicts:5d} ({rate:5.1%})  lost={lost}")
+
+
+if __name__ == "__main__":
+    main()
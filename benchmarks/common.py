@@ -0,0 +1,108 @@
+"""
+ベンチマーク用の共通処理。
+
+一時ディレクトリにDBを作り、create_app() したアプリとログイン済みクライアントを用意する。
+環境変数は app を import する前に設定する必要があるので、各ベンチマークは
+このモジュールを最初に import すること。
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP_DIR = tempfile.mkdtemp(prefix="todo_bench_")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(TMP_DIR, "bench.db"))
+os.environ.setdefault("METRICS_DIR", os.path.join(TMP_DIR, "metrics"))
+os.environ.setdefault("JINJA_BYTECODE_CACHE_DIR", os.path.join(TMP_DIR, "jinja_cache"))
+os.environ.setdefault("TASK_SHARDS_DIR", os.path.join(TMP_DIR, "shards"))
+os.environ.setdefault("USER_SNAPSHOT_EPOCH_DIR", os.path.join(TMP_DIR, "auth_epochs"))
+os.environ.setdefault("SQL_PROFILER_SAMPLE_RATE", "0")
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Project, ProjectMember, Task, User  # noqa: E402
+from app.ranking import initial_ranks  # noqa: E402
+from app.sharding import use_shard  # noqa: E402
+
+PASSWORD = "bench123"
+
+
+def make_app():
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app, projects: int = 1, tasks_per_project: int = 1000, members: int = 5):
+    """
+    admin（社員番号 9999）とメンバー（1000〜）、プロジェクトとタスクを作る。
+    作成したプロジェクトの id のリストを返す。
+    """
+    statuses = [Task.STATUS_TODO, Task.STATUS_DOING, Task.STATUS_DONE]
+    priorities = [Task.PRIORITY_LOW, Task.PRIORITY_MID, Task.PRIORITY_HIGH]
+    pw = generate_password_hash(PASSWORD)
+
+    with app.app_context():
+        admin = User(employee_id=9999, name="管理者", password_hash=pw, role="admin",
+                     is_active=True, is_approved=True)
+        db.session.add(admin)
+        users = []
+        for i in range(members):
+            u = User(employee_id=1000 + i, name=f"メンバー{i}", password_hash=pw,
+                     is_active=True, is_approved=True)
+            db.session.add(u)
+            users.append(u)
+        db.session.flush()
+
+        project_ids = []
+        today = date.today()
+        for p_no in range(projects):
+            p = Project(name=f"プロジェクト{p_no}", description="ベンチマーク用")
+            db.session.add(p)
+            db.session.flush()
+            project_ids.append(p.id)
+            for i, u in enumerate(users):
+                db.session.add(ProjectMember(project_id=p.id, user_id=u.id,
+                                             role_in_project="owner" if i == 0 else "member"))
+            ranks = initial_ranks(tasks_per_project)
+            rows = [
+                {
+                    "project_id": p.id,
+                    "title": f"タスク{i}",
+                    "description": "説明" * 20,
+                    "status": statuses[i % 3],
+                    "priority": priorities[i % 3],
+                    "due_date": today + timedelta(days=i % 30 - 5),
+                    "assignee_id": users[i % len(users)].id,
+                    "created_by": users[0].id,
+                    "rank": ranks[i],
+                }
+                for i in range(tasks_per_project)
+            ]
+            if rows:
+                with use_shard(p.id):
+                    db.session.execute(Task.__table__.insert(), rows)
+        db.session.commit()
+    return project_ids
+
+
+def login(app, employee_id: int = 1000):
+    client = app.test_client()
+    r = client.post("/login", data={"employee_id": str(employee_id), "password": PASSWORD})
+    assert r.status_code == 302, r.status_code
+    return client
+
+
+def timeit(func, repeat: int):
+    """func を repeat 回実行し、1回あたりの平均ミリ秒を返す。"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
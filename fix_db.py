@@ -1,17 +1,14 @@
-import sqlite3
-from pathlib import Path
+# スキーマ変更は app/migrate.py のマイグレーションにまとめた。
+# 以前 users.is_approved を追加していたこのスクリプトは、互換のため
+# 未適用のマイグレーションをすべて適用するだけのラッパーとして残している。
+#   推奨：flask --app run db-migrate
+from app import create_app
+from app.migrate import run_migrations
 
-db_path = Path("instance/app.db").resolve()
-print("DB =", db_path)
+app = create_app()
 
-conn = sqlite3.connect(db_path)
-cur = conn.cursor()
+with app.app_context():
+    print("DB =", app.config["SQLALCHEMY_DATABASE_URI"])
+    count = run_migrations()
 
-try:
-    cur.execute("ALTER TABLE users ADD COLUMN is_approved INTEGER NOT NULL DEFAULT 1")
-    print("✅ is_approved added")
-except Exception as e:
-    print("⚠️ maybe already exists:", e)
-
-conn.commit()
-conn.close()
\ No newline at end of file
+print(f"✅ {count} migration(s) applied")
@@ -1,6 +1,7 @@
 from pathlib import Path
 from app import create_app
 from app.extensions import db
+from app.migrate import run_migrations
 
 app = create_app()
 
@@ -8,5 +9,7 @@ Path(app.instance_path).mkdir(parents=True, exist_ok=True)
 
 with app.app_context():
     db.create_all()
+    # 新規DBでは各マイグレーションは確認だけで済み、適用済みとして記録される
+    run_migrations()
 
-print("✅ DB initialized")
\ No newline at end of file
+print("✅ DB initialized")